@@ -50,6 +50,14 @@ except Exception as e:
 # Attach db to app
 app.db = db
 
+# Indexes for history, auth, password reset and job queue queries (idempotent)
+try:
+    from utils.db_indexes import ensure_indexes
+    ensure_indexes(db)
+    print("✅ MongoDB indexes ensured")
+except Exception as e:
+    print(f"⚠️ Index bootstrap failed: {e}")
+
 # Create uploads folder
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -66,6 +74,15 @@ app.register_blueprint(report_bp, url_prefix='/api/report')
 app.register_blueprint(jargon_bp, url_prefix='/api/jargon')
 app.register_blueprint(password_reset_bp, url_prefix='/api')
 
+# Background workers for queued uploads (they also re-queue orphaned jobs)
+if app.config['REPORT_INPROCESS_WORKERS'] > 0:
+    from utils.job_queue import ReportWorkerPool
+    app.report_workers = ReportWorkerPool(
+        db,
+        num_workers=app.config['REPORT_INPROCESS_WORKERS'],
+        poll_interval=app.config['REPORT_WORKER_POLL_SECONDS']
+    ).start()
+
 @app.route('/')
 def home():
     return jsonify({
@@ -77,9 +94,17 @@ def home():
 
 @app.route('/api/health')
 def health_check():
+    from utils.ocr_cache import ocr_cache
+    from utils.gemini_client import gemini
+    from utils.chat_context import chat_context_cache
+    from utils.jargon_cache import jargon_cache
     return jsonify({
         'status': 'healthy',
-        'service': 'medical-report-api'
+        'service': 'medical-report-api',
+        'ocr_cache': ocr_cache.stats(),
+        'gemini': gemini.metrics(),
+        'chat_context_cache': chat_context_cache.stats(),
+        'jargon_cache': jargon_cache.stats()
     })
 
 @app.route('/api/disclaimer')
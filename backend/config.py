@@ -17,5 +17,11 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
     
+    # Background report jobs (POST /api/report/upload with async=true)
+    # Threads started inside each web worker (0 disables background processing -
+    # jobs must run where the upload was saved)
+    REPORT_INPROCESS_WORKERS = int(os.getenv('REPORT_INPROCESS_WORKERS', 1))
+    REPORT_WORKER_POLL_SECONDS = float(os.getenv('REPORT_WORKER_POLL_SECONDS', 1.0))
+    
     # Frontend URL for CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
\ No newline at end of file
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
-from utils.ai_explainer import explain_medical_term
+from utils.ai_explainer import explain_medical_term, explain_medical_terms, JARGON_BATCH_MAX_TERMS
 
 jargon_bp = Blueprint('jargon', __name__)
 
@@ -12,7 +12,31 @@ def explain():
         return jsonify({"error": "Term is required"}), 400
 
     try:
-        result = explain_medical_term(term)
+        result = explain_medical_term(term, db=current_app.db)
         return jsonify(result)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+@jargon_bp.route('/explain-batch', methods=['POST'])
+def explain_batch():
+    """
+    Explain several terms in one request: {"terms": [...]}
+    Duplicates are explained once; known terms never reach the LLM.
+    """
+    data = request.get_json() or {}
+    terms = data.get('terms')
+
+    if not isinstance(terms, list) or not all(isinstance(term, str) for term in terms):
+        return jsonify({"error": "terms must be a list of strings"}), 400
+    terms = [term for term in terms if term.strip()]
+    if not terms:
+        return jsonify({"error": "At least one term is required"}), 400
+    if len(terms) > JARGON_BATCH_MAX_TERMS:
+        return jsonify({"error": f"At most {JARGON_BATCH_MAX_TERMS} terms per request"}), 400
+
+    try:
+        results, stats = explain_medical_terms(terms, db=current_app.db)
+        return jsonify({"results": results, **stats})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
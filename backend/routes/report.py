@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
 import sys
 import re
+import json
 from typing import List, Dict
 import time
-from datetime import datetime
-from pytz import timezone
+from datetime import datetime, timedelta
+from pytz import timezone, utc
 from difflib import SequenceMatcher
 IST = timezone('Asia/Kolkata')
 report_bp = Blueprint('report', __name__)
@@ -43,17 +44,39 @@ except Exception as e:
 # Import OCR
 try:
     from utils.ocr import process_file
+    from utils.pdf_document import PDFDocument
     print("✅ OCR (PyPDF2) loaded successfully")
     OCR_AVAILABLE = True
 except Exception as e:
     print(f"❌ OCR not available: {e}")
     process_file = None
+    PDFDocument = None
     OCR_AVAILABLE = False
+# Import upload pipeline + background job queue
+from utils.report_pipeline import (
+    process_uploaded_report, ReportProcessingError, build_history_summary,
+    format_uploaded_at, uploaded_at_iso
+)
+from utils.job_queue import create_job, get_job, format_job
+from utils.report_cache import save_and_hash
+from utils.gemini_client import GeminiError, GeminiTimeout, GeminiUnavailable
+from utils.chat_context import build_chat_context, get_chat_context, chat_context_cache
+from utils.chat_sessions import (
+    get_or_create_session, append_turn, build_chat_prompt, delete_report_sessions
+)
 # ============================================
 # CONSTANTS
 # ============================================
 MAX_FILE_SIZE = 50 * 1024 * 1024 # 50MB
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'jfif'}
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 100
+# Fields needed to build history_summary for reports saved before it existed
+HISTORY_LEGACY_FIELDS = [
+    'original_filename', 'plain_language_summary', 'summary.method',
+    'summary.report_type', 'summary.ai_enhanced', 'extraction_method', 'use_ai',
+    'verification_enabled', 'file_size_mb'
+]
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -63,6 +86,33 @@ def validate_file_size(file):
     size = file.tell()
     file.seek(0) # Reset to beginning
     return size <= MAX_FILE_SIZE, size
+def history_date_range(date_from, date_to):
+    """
+    Build an uploaded_at range filter from YYYY-MM-DD bounds (IST calendar days,
+    both inclusive). Returns None when neither bound is given; raises ValueError
+    on malformed dates.
+    """
+    date_range = {}
+    if date_from:
+        start = IST.localize(datetime.strptime(date_from, '%Y-%m-%d'))
+        date_range['$gte'] = start.astimezone(utc).replace(tzinfo=None)
+    if date_to:
+        end = IST.localize(datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
+        date_range['$lt'] = end.astimezone(utc).replace(tzinfo=None)
+    return date_range or None
+def history_cursor_filter(anchor):
+    """
+    Keyset condition for "reports after this one" in (uploaded_at desc, _id desc) order
+    """
+    uploaded_at = anchor.get('uploaded_at')
+    conditions = [
+        {'uploaded_at': {'$lt': uploaded_at}},
+        {'uploaded_at': uploaded_at, '_id': {'$lt': anchor['_id']}}
+    ]
+    if isinstance(uploaded_at, datetime):
+        # Un-migrated reports (string/missing uploaded_at) sort after every datetime
+        conditions.append({'uploaded_at': {'$not': {'$type': 'date'}}})
+    return conditions
 # ============================================
 # REGEX EXTRACTION FUNCTION (ADDED FOR FIX)
 # ============================================
@@ -150,6 +200,15 @@ def upload_report():
                 'error': f'File too large. Maximum size is {MAX_FILE_SIZE/(1024*1024):.1f}MB',
                 'file_size': f'{file_size/(1024*1024):.1f}MB'
             }), 400
+        # Optional: comma-separated panel names - extraction stops once all are found
+        expected_panels = [p.strip() for p in request.form.get('expected_panels', '').split(',') if p.strip()]
+        if RULE_BASED_AVAILABLE:
+            unknown_panels = [p for p in expected_panels if p not in MedicalReportParser.REPORT_PANELS]
+            if unknown_panels:
+                return jsonify({
+                    'error': f'Unknown panel(s): {", ".join(unknown_panels)}',
+                    'valid_panels': list(MedicalReportParser.REPORT_PANELS)
+                }), 400
         # Save file
         filename = secure_filename(file.filename)
         timestamp = datetime.now(IST).strftime('%Y%m%d_%H%M%S')
@@ -158,308 +217,61 @@ def upload_report():
         if not os.path.exists(upload_folder):
             os.makedirs(upload_folder, exist_ok=True)
         filepath = os.path.join(upload_folder, unique_filename)
-        file.save(filepath)
+        # Hash while streaming to disk - the digest keys the report cache
+        file_hash = save_and_hash(file, filepath)
         print(f"\n{'='*60}")
         print(f"📄 FILE UPLOADED: {filename}")
         print(f"📏 Size: {file_size/(1024*1024):.1f}MB")
+        print(f"🔑 SHA-256: {file_hash}")
         print(f"{'='*60}")
-        # ============================================
-        # STEP 0.5: VERIFICATION (OPTIONAL)
-        # ============================================
         verify_report_str = request.form.get('verify_report', 'false')
         verify_report = verify_report_str.lower() in ['true', '1', 'yes']
-        print(f"🔍 Verification Toggle: {'ON' if verify_report else 'OFF'}")
-        verification_result = None
-        if verify_report:
-            try:
-                print("🔍 VERIFICATION ENABLED - Running forensics...")
-                from utils.pdf_forensics import PDFForensics
-             
-                forensics = PDFForensics()
-                verification_result = forensics.analyze_pdf(filepath)
-             
-                print(f"✅ Verification complete!")
-                print(f" Trust Score: {verification_result['trust_score']}/100")
-                print(f" Risk Level: {verification_result['risk_level']}")
-             
-            except Exception as e:
-                print(f"❌ Verification failed: {e}")
-                import traceback
-                traceback.print_exc()
-                verification_result = {
-                    'verified': False,
-                    'trust_score': 0,
-                    'risk_level': 'Error',
-                    'findings': [f'Verification error: {str(e)}'],
-                    'recommendations': ['Unable to verify - manual review required']
-                }
-        else:
-            print("🔍 Verification: Skipped (toggle OFF)")
-        # ============================================
-        # STEP 1: EXTRACT TEXT
-        # ============================================
-        extracted_text = None
-        extraction_method = None
-     
-        # Try PyPDF2 first (FASTEST) - ONLY for PDFs
-        if filepath.lower().endswith('.pdf') and OCR_AVAILABLE and callable(process_file):
-            try:
-                print("🔄 Trying PyPDF2 (fast local extraction)...")
-                extracted_text = process_file(filepath)
-             
-                # Check if text is meaningful (more than 50 chars)
-                if extracted_text and len(extracted_text.strip()) > 50:
-                    extraction_method = "PyPDF2 (local)"
-                    print(f"✅ PyPDF2 SUCCESS! Extracted {len(extracted_text)} chars in <1 second")
-                else:
-                    # PyPDF2 returned empty/minimal text - likely scanned
-                    print(f"⚠️ PyPDF2 returned minimal text ({len(extracted_text or '')} chars) - likely scanned PDF")
-                    extracted_text = None # Reset to trigger AI fallback
-            except Exception as e:
-                print(f"❌ PyPDF2 failed: {e}")
-                extracted_text = None
-        # Fallback to Gemini AI OCR
-        if not extracted_text:
-            try:
-                print("📸 PyPDF2 failed/insufficient text → Trying Gemini AI OCR...")
-                from utils.ai_summarizer import extract_text_from_pdf_with_ai
-             
-                extracted_text = extract_text_from_pdf_with_ai(filepath)
-             
-                if extracted_text and len(extracted_text.strip()) > 50:
-                    extraction_method = "Gemini AI OCR"
-                    print(f"✅ Gemini AI SUCCESS! Extracted {len(extracted_text)} chars")
-                else:
-                    print(f"❌ Gemini AI returned insufficient text")
-                    extracted_text = None
-                 
-            except Exception as e:
-                print(f"❌ Gemini AI OCR failed: {e}")
-                import traceback
-                traceback.print_exc()
-        # Final validation
-        if not extracted_text or len(extracted_text.strip()) < 50:
-            error_msg = 'Could not extract text from report'
-            details = 'File may be corrupted, password-protected, or severely damaged. '
-         
-            if filepath.lower().endswith('.pdf'):
-                details += 'PDF appears to be scanned but OCR failed. Try a clearer scan or digital PDF.'
-            else:
-                details += 'Image quality may be too low for text recognition.'
-         
-            return jsonify({
-                'error': error_msg,
-                'details': details
-            }), 400
-        print(f"\n{'='*60}")
-        print(f"✅ TEXT EXTRACTION COMPLETE")
-        print(f"Method: {extraction_method}")
-        print(f"Text length: {len(extracted_text)} characters")
-        print(f"{'='*60}\n")
-        # ============================================
-        # STEP 2: RULE-BASED ANALYSIS
-        # ============================================
-        rule_based_summary = None
-        parsed_data = None
-     
-        if RULE_BASED_AVAILABLE and extracted_text:
-            try:
-                print("🧪 RUNNING RULE-BASED SYSTEM (YOUR CODE)...")
-             
-                # Parse the report
-                parser = MedicalReportParser()
-                parsed_data = parser.parse_report(
-                    extracted_text,
-                    gender="female", # TODO: Get from user profile
-                    age=50 # TODO: Get from user profile
-                )
-             
-                print(f"📊 Parsed {parsed_data['total_tests']} tests from report")
-                print(f"📋 Report type: {parsed_data['report_type']}")
-             
-                # Generate summary using template system
-                summarizer = TemplateSummarizer()
-                rule_based_summary = summarizer.generate_summary(parsed_data)
-             
-                print(f"✅ RULE-BASED SUMMARY GENERATED! ({len(rule_based_summary)} chars)")
-                print(f"{'='*60}\n")
-             
-            except Exception as e:
-                print(f"❌ Rule-based system error: {e}")
-                import traceback
-                traceback.print_exc()
-        # ============================================
-        # STEP 2.5: MEDICAL VALIDATION
-        # ============================================
-        medical_validation = None
-        if verify_report and parsed_data:
-            try:
-                print("⚕️ MEDICAL VALIDATION - Checking value plausibility...")
-                from utils.medical_validator import MedicalValidator
-             
-                validator = MedicalValidator()
-                medical_validation = validator.validate_report(parsed_data)
-             
-                print(f"✅ Medical validation complete!")
-                print(f" Medical Suspicion: {medical_validation['suspicion_score']}")
-             
-                # Combine PDF forensics + medical validation
-                if verification_result:
-                    combined_suspicion = verification_result.get('suspicion_score', 0) + medical_validation['suspicion_score']
-                 
-                    # Recalculate trust score
-                    verification_result['trust_score'] = max(0, 100 - combined_suspicion)
-                    verification_result['findings'].extend(medical_validation['findings'])
-                    verification_result['medical_validation'] = medical_validation
-                 
-                    # Redetermine risk level
-                    trust_score = verification_result['trust_score']
-                    if trust_score >= 90:
-                        verification_result['risk_level'] = "Verified ✅"
-                    elif trust_score >= 70:
-                        verification_result['risk_level'] = "Low Risk"
-                    elif trust_score >= 50:
-                        verification_result['risk_level'] = "Medium Risk"
-                    elif trust_score >= 30:
-                        verification_result['risk_level'] = "High Risk"
-                    else:
-                        verification_result['risk_level'] = "Critical - Likely Fake"
-                 
-                    print(f" Combined Trust Score: {verification_result['trust_score']}/100")
-                    print(f" Final Risk Level: {verification_result['risk_level']}")
-             
-            except Exception as e:
-                print(f"❌ Medical validation failed: {e}")
-                import traceback
-                traceback.print_exc()
-        # ============================================
-        # STEP 3: AI ENHANCEMENT
-        # ============================================
         use_ai_str = request.form.get('use_ai', 'false')
         use_ai = use_ai_str.lower() in ['true', '1', 'yes']
-        print(f"🤖 AI Enhancement Toggle: {'ON' if use_ai else 'OFF'}")
-        ai_enhanced_summary = None
-        ai_enhancement_success = False
-        if use_ai and rule_based_summary:
-            try:
-                print("✨ AI ENHANCEMENT ENABLED - Polishing summary...")
-                from utils.ai_summarizer import enhance_summary_with_ai
-             
-                ai_enhanced_summary = enhance_summary_with_ai(rule_based_summary)
-             
-                # Check if AI actually returned something different
-                if ai_enhanced_summary and ai_enhanced_summary != rule_based_summary:
-                    ai_enhancement_success = True
-                    print(f"✅ AI enhancement SUCCESS!")
-                else:
-                    print(f"⚠️ AI enhancement returned same content (likely failed)")
-                    ai_enhanced_summary = None
-             
-            except Exception as e:
-                print(f"❌ AI enhancement failed: {e}")
-                import traceback
-                traceback.print_exc()
-                ai_enhanced_summary = None
-        # Use enhanced version if available AND successful
-        final_summary = ai_enhanced_summary if ai_enhancement_success else rule_based_summary
-        print(f"\n{'='*60}")
-        print(f"📝 FINAL SUMMARY METHOD:")
-        print(f" Using: {'AI Enhanced' if ai_enhancement_success else 'Rule-based Only'}")
-        print(f" Length: {len(final_summary)} characters")
-        print(f"{'='*60}\n")
-        # ============================================
-        # STEP 4: AI FALLBACK
-        # ============================================
-        ai_summary = None
-        quick_summary = None
-     
-        if not rule_based_summary:
-            print("🚨 Rule-based failed, using AI fallback...")
-            try:
-                from utils.ai_summarizer import generate_medical_summary, generate_quick_summary
-                ai_summary = generate_medical_summary(extracted_text)
-                quick_summary = generate_quick_summary(extracted_text)
-                print("✅ AI summary generated (fallback)")
-            except Exception as e:
-                print(f"❌ AI summary also failed: {e}")
-                return jsonify({'error': 'Summary generation failed completely'}), 500
-        else:
-            print("✅ Using rule-based summary")
-            quick_summary = f"Analysis of {parsed_data['report_type']} - {parsed_data['total_tests']} tests analyzed"
+        async_str = request.form.get('async', 'false')
+        run_async = async_str.lower() in ['true', '1', 'yes']
         # ============================================
-        # STEP 5: PREPARE FINAL SUMMARY
+        # JOB MODE: queue for the worker pool, return immediately
         # ============================================
-     
-        if not final_summary:
-            return jsonify({'error': 'Summary generation failed'}), 500
-        summary_data = {
-            'plain_language_summary': final_summary,
-            'quick_summary': quick_summary,
-            'status': 'success',
-            'word_count': len(extracted_text.split()),
-            'method': 'rule_based_with_ai' if ai_enhancement_success else 'rule_based_only',
-            'extraction_method': extraction_method,
-            'tests_found': parsed_data['total_tests'] if parsed_data else 0,
-            'report_type': parsed_data['report_type'] if parsed_data else 'Unknown',
-            'ai_enhanced': ai_enhancement_success,
-            'verification': verification_result,
-            'verification_enabled': verify_report,
-            'medical_validation': medical_validation
-        }
-        print(f"\n{'='*60}")
-        print(f"🎯 FINAL SUMMARY PREPARED")
-        print(f"Method: {summary_data['method']}")
-        print(f"Extraction: {extraction_method}")
-        print(f"Tests found: {summary_data['tests_found']}")
-        print(f"{'='*60}\n")
+        if run_async:
+            job_id = create_job(current_app.db, current_user, {
+                'filepath': filepath,
+                'filename': filename,
+                'unique_filename': unique_filename,
+                'file_size': file_size,
+                'file_hash': file_hash,
+                'expected_panels': expected_panels,
+                'verify_report': verify_report,
+                'use_ai': use_ai
+            })
+            print(f"📥 Queued report job {job_id}")
+            return jsonify({
+                'message': 'Report queued for processing',
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/api/report/jobs/{job_id}',
+                'filename': filename,
+                'file_size': f'{file_size/(1024*1024):.2f}MB'
+            }), 202
         # ============================================
-        # STEP 6: SAVE TO DATABASE
+        # SYNCHRONOUS MODE: run the whole pipeline in this request
         # ============================================
-        reports_collection = current_app.db['reports']
-        report_data = {
-            'user_email': current_user,
-            'filename': unique_filename,
-            'original_filename': filename,
-            'filepath': filepath,
-            'file_size_mb': f'{file_size/(1024*1024):.2f}',
-            'extracted_text': extracted_text,
-            'extraction_method': extraction_method,
-            'summary': summary_data,
-            'plain_language_summary': final_summary,
-            'rule_based_summary': rule_based_summary,
-            'ai_enhanced_summary': ai_enhanced_summary,
-            'ai_summary': ai_summary,
-            'use_ai': use_ai,
-            'verification': verification_result,
-            'verification_enabled': verify_report,
-            'medical_validation': medical_validation,
-            'parsed_data': parsed_data,
-            'uploaded_at': datetime.now(IST).strftime("%Y-%m-%d %I:%M %p"),
-            'processed': True
-        }
-        result = reports_collection.insert_one(report_data)
-        report_id = str(result.inserted_id)
-     
-        print(f"💾 Saved to database - Report ID: {report_id}\n")
-        # Update user's reports array
-        users_collection = current_app.db['users']
-        users_collection.update_one(
-            {'email': current_user},
-            {'$push': {'reports': report_id}}
-        )
-        return jsonify({
-            'message': 'Report processed successfully',
-            'report_id': report_id,
-            'filename': filename,
-            'file_size': f'{file_size/(1024*1024):.2f}MB',
-            'summary': summary_data,
-            'plain_language_summary': final_summary,
-            'method_used': summary_data['method'],
-            'extraction_method': extraction_method,
-            'tests_analyzed': summary_data['tests_found'],
-            'ai_enhanced': summary_data['ai_enhanced'],
-            'verification_enabled': summary_data['verification_enabled']
-        }), 200
+        try:
+            response_data = process_uploaded_report(
+                current_app.db,
+                current_user,
+                filepath,
+                filename,
+                unique_filename,
+                file_size,
+                verify_report=verify_report,
+                use_ai=use_ai,
+                file_hash=file_hash,
+                expected_panels=expected_panels
+            )
+        except ReportProcessingError as e:
+            return jsonify(e.payload), e.status_code
+        return jsonify(response_data), 200
     except Exception as e:
         print(f"\n❌ ERROR in upload_report:")
         print(f"{'='*60}")
@@ -471,39 +283,114 @@ def upload_report():
         # Cleanup in case of errors during file processing
         pass
 # ============================================
+# UPLOAD JOB STATUS ENDPOINT
+# ============================================
+@report_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_upload_job(job_id):
+    """
+    Status and per-stage progress of a queued upload (POST /upload with async=true)
+    """
+    try:
+        if not BSON_AVAILABLE:
+            return jsonify({'error': 'Database features unavailable'}), 500
+
+        current_user = get_jwt_identity()
+        job = get_job(current_app.db, job_id, current_user)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify(format_job(job)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+# ============================================
 # HISTORY ENDPOINT
 # ============================================
 @report_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_history():
+    """
+    Paginated report history (newest first)
+    Query params: limit (default 50, max 100), before (cursor from next_before),
+                  from / to (YYYY-MM-DD, IST, inclusive) to restrict the upload date range
+    Only the compact history_summary sub-document is read from MongoDB.
+    """
     try:
         if not BSON_AVAILABLE:
             return jsonify({'error': 'Database features unavailable'}), 500
          
         current_user = get_jwt_identity()
         reports_collection = current_app.db['reports']
+
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_DEFAULT_LIMIT)), 1), HISTORY_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+
+        query = {'user_email': current_user}
+        try:
+            date_range = history_date_range(request.args.get('from'), request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'from/to must be dates in YYYY-MM-DD format'}), 400
+        if date_range:
+            query['uploaded_at'] = date_range
+
+        before = request.args.get('before')
+        if before:
+            if not ObjectId.is_valid(before):
+                return jsonify({'error': 'Invalid pagination cursor'}), 400
+            anchor = reports_collection.find_one(
+                {'_id': ObjectId(before), 'user_email': current_user},
+                {'uploaded_at': 1}
+            )
+            if not anchor:
+                return jsonify({'error': 'Invalid pagination cursor'}), 400
+            query['$or'] = history_cursor_filter(anchor)
+
+        # Fetch one extra document to know whether another page exists
         reports = list(reports_collection.find(
-            {'user_email': current_user}
-        ).sort('uploaded_at', -1))
+            query,
+            {'history_summary': 1, 'uploaded_at': 1}
+        ).sort([('uploaded_at', -1), ('_id', -1)]).limit(limit + 1))
+        has_more = len(reports) > limit
+        reports = reports[:limit]
+
+        # Reports saved before history_summary existed: build it once and store it
+        missing_ids = [report['_id'] for report in reports if 'history_summary' not in report]
+        if missing_ids:
+            legacy_reports = reports_collection.find(
+                {'_id': {'$in': missing_ids}},
+                {field: 1 for field in HISTORY_LEGACY_FIELDS}
+            )
+            backfilled = {}
+            for legacy in legacy_reports:
+                backfilled[legacy['_id']] = build_history_summary(legacy)
+                reports_collection.update_one(
+                    {'_id': legacy['_id']},
+                    {'$set': {'history_summary': backfilled[legacy['_id']]}}
+                )
+            for report in reports:
+                if report['_id'] in backfilled:
+                    report['history_summary'] = backfilled[report['_id']]
+
         formatted_reports = []
         for report in reports:
             formatted_reports.append({
                 'id': str(report['_id']),
-                'filename': report.get('original_filename', 'Unknown'),
-                'uploaded_at': report.get('uploaded_at'),
-                'plain_summary': report.get('plain_language_summary', 'No summary available'),
-                'method': report.get('summary', {}).get('method', 'unknown'),
-                'extraction_method': report.get('extraction_method', 'unknown'),
-                'report_type': report.get('summary', {}).get('report_type', 'Unknown'),
-                'ai_enhanced': report.get('summary', {}).get('ai_enhanced', False),
-                'use_ai': report.get('use_ai', False),
-                'verification_enabled': report.get('verification_enabled', False),
-                'file_size': report.get('file_size_mb', 'Unknown')
+                **report.get('history_summary', {}),
+                'uploaded_at': format_uploaded_at(report.get('uploaded_at')),
+                'uploaded_at_iso': uploaded_at_iso(report.get('uploaded_at'))
             })
+
+        count_query = {'user_email': current_user}
+        if date_range:
+            count_query['uploaded_at'] = date_range
         return jsonify({
             'message': 'History retrieved successfully',
-            'total_reports': len(formatted_reports),
-            'reports': formatted_reports
+            'total_reports': reports_collection.count_documents(count_query),
+            'reports': formatted_reports,
+            'has_more': has_more,
+            'next_before': formatted_reports[-1]['id'] if has_more else None
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -528,7 +415,8 @@ def get_report_details(report_id):
         return jsonify({
             'id': str(report['_id']),
             'filename': report.get('original_filename'),
-            'uploaded_at': report.get('uploaded_at'),
+            'uploaded_at': format_uploaded_at(report.get('uploaded_at')),
+            'uploaded_at_iso': uploaded_at_iso(report.get('uploaded_at')),
             'extracted_text': report.get('extracted_text'),
             'summary': report.get('summary'),
             'plain_language_summary': report.get('plain_language_summary'),
@@ -591,6 +479,14 @@ def verify_report_authenticity(report_id):
                 'details': 'The original PDF file is no longer available'
             }), 404
       
+        # Parse the PDF once for forensics and any re-extraction below
+        document = None
+        if OCR_AVAILABLE:
+            try:
+                document = PDFDocument.open(filepath)
+            except Exception as e:
+                print(f"⚠️ Could not open PDF: {e}")
+      
         # ============================================
         # STEP 1: PDF FORENSICS
         # ============================================
@@ -601,7 +497,7 @@ def verify_report_authenticity(report_id):
             from utils.pdf_forensics import PDFForensics
           
             forensics = PDFForensics()
-            verification_result = forensics.analyze_pdf(filepath)
+            verification_result = forensics.analyze_pdf(filepath, document=document)
           
             print(f"✅ PDF Forensics complete!")
             print(f" Trust Score: {verification_result['trust_score']}/100")
@@ -633,7 +529,7 @@ def verify_report_authenticity(report_id):
             # Re-extract if needed
             if OCR_AVAILABLE and callable(process_file):
                 try:
-                    extracted_text = process_file(filepath)
+                    extracted_text = process_file(filepath, document=document)
                 except Exception as e:
                     print(f"❌ Text extraction failed: {e}")
                     extracted_text = None
@@ -740,14 +636,16 @@ def verify_report_authenticity(report_id):
                 'last_verified_at': datetime.now(IST).strftime("%Y-%m-%d %I:%M %p")
             }
           
-            # Also update parsed_data if we re-parsed
+            # Also update parsed_data (and the chat context built from it) if we re-parsed
             if parsed_data:
                 update_data['parsed_data'] = parsed_data
+                update_data['chat_context'] = build_chat_context({**report, 'parsed_data': parsed_data})
           
             reports_collection.update_one(
                 {'_id': ObjectId(report_id)},
                 {'$set': update_data}
             )
+            chat_context_cache.invalidate(report_id)
           
             print(f"💾 Updated report in database")
           
@@ -838,11 +736,11 @@ def compare_reports():
         # Text extraction
         start_time = time.time()
        
-        text1 = extract_text_from_report_with_retry(filepath1, "Report 1")
+        text1 = extract_text_from_report(filepath1, "Report 1")
         if not text1:
             return jsonify({'error': 'Could not extract text from Report 1'}), 400
            
-        text2 = extract_text_from_report_with_retry(filepath2, "Report 2")
+        text2 = extract_text_from_report(filepath2, "Report 2")
         if not text2:
             return jsonify({'error': 'Could not extract text from Report 2'}), 400
        
@@ -928,6 +826,17 @@ def compare_reports():
             'processing_time_seconds': round(total_time, 1)
         }), 200
        
+    except GeminiUnavailable as e:
+        return jsonify({
+            'error': 'AI OCR is temporarily unavailable',
+            'details': str(e),
+            'retry_after_seconds': round(e.retry_after or 0)
+        }), 503
+    except GeminiError as e:
+        return jsonify({
+            'error': 'AI OCR failed',
+            'details': str(e)
+        }), 504 if isinstance(e, GeminiTimeout) else 502
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -943,28 +852,11 @@ def compare_reports():
 # ============================================
 # 🔥 IMPROVED HELPER FUNCTIONS
 # ============================================
-def extract_text_from_report_with_retry(filepath, report_name, max_retries=2):
-    """
-    Extract text from a report with retry logic for transient failures
-    """
-    for attempt in range(max_retries):
-        try:
-            text = extract_text_from_report(filepath, report_name)
-            if text and len(text.strip()) > 50:
-                return text
-        except Exception as e:
-            print(f"⚠️ {report_name} Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                print(f"🔄 Retrying...")
-                time.sleep(1) # Wait 1 second before retry
-            else:
-                print(f"❌ All {max_retries} attempts failed")
-                return None
- 
-    return None
 def extract_text_from_report(filepath, report_name):
     """
-    Extract text from a report using PyPDF2 or AI fallback
+    Extract text from a report using PyPDF2 or AI fallback.
+    Gemini failures (GeminiError) propagate: the shared client has already
+    retried them, so the route must not.
     """
     text = None
  
@@ -1002,6 +894,9 @@ def extract_text_from_report(filepath, report_name):
             print(f"❌ {report_name}: AI OCR returned insufficient text")
             return None
          
+    except GeminiError as e:
+        print(f"🚫 {report_name}: {e}")
+        raise
     except Exception as e:
         print(f"❌ {report_name} AI OCR failed: {e}")
         return None
@@ -1910,6 +1805,89 @@ def get_diet_recommendations(report_id):
 # ============================================
 # 🔥 CHAT WITH REPORT ENDPOINT 🔥
 # ============================================
+def load_chat_turn(report_id):
+    """
+    Validate a chat request, fetch the report's chat_context and the chat
+    session (a new one when the request has no session_id).
+    Returns ((chat_context, question, session), None) or (None, error response)
+    """
+    if not BSON_AVAILABLE:
+        return None, (jsonify({'error': 'Database features unavailable'}), 500)
+     
+    current_user = get_jwt_identity()
+ 
+    # Get user's question; the conversation itself lives server-side
+    data = request.get_json()
+    user_question = data.get('question', '').strip()
+ 
+    if not user_question:
+        return None, (jsonify({'error': 'Question is required'}), 400)
+ 
+    # Precomputed prompt context (one small read when cached)
+    chat_context = get_chat_context(current_app.db, ObjectId(report_id), current_user)
+ 
+    if not chat_context:
+        return None, (jsonify({'error': 'Report not found'}), 404)
+ 
+    # Older clients still send `history`: it only seeds a new session
+    session = get_or_create_session(
+        current_app.db, report_id, current_user,
+        session_id=data.get('session_id'),
+        seed_history=data.get('history')
+    )
+    print(f"\n{'='*60}")
+    print(f"💬 CHAT WITH REPORT")
+    print(f"Report ID: {report_id}")
+    print(f"Question: {user_question}")
+    print(f"Session: {session['_id']} ({session.get('turns', 0)} turns, "
+          f"{len(session.get('messages', []))} recent messages)")
+    print(f"{'='*60}\n")
+    return (chat_context, user_question, session), None
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def chat_event_stream(chunks, user_question, session_id=None, on_answer=None):
+    """
+    SSE frames for a streamed chat answer: start, token*, then done or error.
+    Pulls one Gemini chunk per frame the server writes, so a slow client
+    never makes us buffer the answer; closing this generator (client
+    disconnect) closes the upstream Gemini stream.
+    on_answer(answer) runs before `done` (stores the turn in the session).
+    """
+    answer = []
+    try:
+        yield sse_event('start', {'question': user_question, 'session_id': session_id})
+        for text in chunks:
+            answer.append(text)
+            yield sse_event('token', {'text': text})
+        print(f"✅ AI Response streamed ({len(''.join(answer))} chars)")
+        if on_answer is not None:
+            on_answer(''.join(answer))
+        yield sse_event('done', {
+            'success': True,
+            'answer': ''.join(answer),
+            'question': user_question,
+            'session_id': session_id,
+            'timestamp': datetime.now(IST).strftime("%Y-%m-%d %I:%M %p")
+        })
+    except GeminiUnavailable as e:
+        print(f"🚫 AI generation skipped: {e}")
+        yield sse_event('error', {
+            'error': 'AI assistant is temporarily unavailable',
+            'details': str(e),
+            'retry_after_seconds': round(e.retry_after or 0)
+        })
+    except Exception as e:
+        print(f"❌ AI streaming failed: {e}")
+        yield sse_event('error', {'error': 'Failed to generate response', 'details': str(e)})
+    finally:
+        chunks.close()
+
+
 @report_bp.route('/chat/<report_id>', methods=['POST'])
 @jwt_required()
 def chat_with_report(report_id):
@@ -1918,118 +1896,40 @@ def chat_with_report(report_id):
     Provides context-aware answers based on report data
     """
     try:
-        if not BSON_AVAILABLE:
-            return jsonify({'error': 'Database features unavailable'}), 500
-         
-        current_user = get_jwt_identity()
-     
-        # Get user's question and chat history
-        data = request.get_json()
-        user_question = data.get('question', '').strip()
-        chat_history = data.get('history', []) # List of {role, content}
-     
-        if not user_question:
-            return jsonify({'error': 'Question is required'}), 400
-     
-        # Fetch the report
-        reports_collection = current_app.db['reports']
-        report = reports_collection.find_one({
-            '_id': ObjectId(report_id),
-            'user_email': current_user
-        })
-     
-        if not report:
-            return jsonify({'error': 'Report not found'}), 404
-     
-        print(f"\n{'='*60}")
-        print(f"💬 CHAT WITH REPORT")
-        print(f"Report ID: {report_id}")
-        print(f"Question: {user_question}")
-        print(f"History length: {len(chat_history)}")
-        print(f"{'='*60}\n")
-     
-        # Get report data
-        plain_summary = report.get('plain_language_summary', '')
-        parsed_data = report.get('parsed_data', {})
-        extracted_text = report.get('extracted_text', '')
+        turn, error = load_chat_turn(report_id)
+        if error:
+            return error
+        chat_context, user_question, session = turn
      
         # Build context for AI
         try:
-            import requests
-            import os
-         
-            # Use REST API with correct model
-            GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-            url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-         
-            headers = {"Content-Type": "application/json"}
-         
-            # Build comprehensive context
-            context = f"""You are a helpful medical assistant analyzing a patient's medical report.
-REPORT SUMMARY:
-{plain_summary}
-AVAILABLE TEST DATA:
-"""
+            from utils.gemini_client import gemini
+            context = build_chat_prompt(chat_context, user_question, session)
          
-            # Add test results if available
-            if parsed_data and 'all_results' in parsed_data:
-                context += "\nTest Results:\n"
-                for test in parsed_data['all_results'][:20]: # Limit to first 20 tests
-                    term = test.get('term', '')
-                    value = test.get('value', '')
-                    unit = test.get('unit', '')
-                    status = test.get('status', '')
-                    if term and value:
-                        context += f"- {term}: {value} {unit} ({status})\n"
-         
-            context += f"""
-INSTRUCTIONS:
-1. Answer the user's question based on the report data above
-2. Be clear, accurate, and helpful
-3. Cite specific test values when relevant
-4. Use simple language, avoid medical jargon unless necessary
-5. If the report doesn't contain info to answer the question, say so politely
-6. Add disclaimers when giving medical advice
-7. Keep responses concise but informative
-USER QUESTION: {user_question}
-Provide a helpful, accurate answer:"""
-         
-            # Build conversation history for context
-            conversation = []
-            for msg in chat_history[-6:]: # Keep last 6 messages for context
-                conversation.append(f"{msg['role'].upper()}: {msg['content']}")
-         
-            if conversation:
-                context = "CONVERSATION HISTORY:\n" + "\n".join(conversation) + "\n\n" + context
-         
-            # Generate response using REST API
+            # Generate response via the shared Gemini client
             print("🤖 Generating AI response...")
          
-            payload = {
-                "contents": [{
-                    "parts": [{"text": context}]
-                }]
-            }
+            ai_answer = gemini.generate(context, timeout=30, label='chat')
          
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            print(f"✅ AI Response generated ({len(ai_answer)} chars)")
+            print(f"{'='*60}\n")
+            append_turn(current_app.db, session['_id'], user_question, ai_answer)
          
-            if response.status_code == 200:
-                result = response.json()
-                ai_answer = result['candidates'][0]['content']['parts'][0]['text']
-             
-                print(f"✅ AI Response generated ({len(ai_answer)} chars)")
-                print(f"{'='*60}\n")
-             
-                return jsonify({
-                    'success': True,
-                    'answer': ai_answer,
-                    'question': user_question,
-                    'timestamp': datetime.now(IST).strftime("%Y-%m-%d %I:%M %p")
-                }), 200
-            else:
-                error_detail = response.json() if response.text else response.text
-                raise Exception(f"Gemini API Error {response.status_code}: {error_detail}")
+            return jsonify({
+                'success': True,
+                'answer': ai_answer,
+                'question': user_question,
+                'session_id': str(session['_id']),
+                'timestamp': datetime.now(IST).strftime("%Y-%m-%d %I:%M %p")
+            }), 200
          
+        except GeminiUnavailable as e:
+            print(f"🚫 AI generation skipped: {e}")
+            return jsonify({
+                'error': 'AI assistant is temporarily unavailable',
+                'details': str(e),
+                'retry_after_seconds': round(e.retry_after or 0)
+            }), 503
         except Exception as e:
             print(f"❌ AI generation failed: {e}")
             import traceback
@@ -2046,6 +1946,48 @@ Provide a helpful, accurate answer:"""
         traceback.print_exc()
         print(f"{'='*60}\n")
         return jsonify({'error': str(e)}), 500
+@report_bp.route('/chat/<report_id>/stream', methods=['POST'])
+@jwt_required()
+def chat_with_report_stream(report_id):
+    """
+    Streaming chat: same request body as /chat/<report_id>; the answer is
+    relayed token by token as Server-Sent Events (start, token..., done or error)
+    """
+    try:
+        turn, error = load_chat_turn(report_id)
+        if error:
+            return error
+        chat_context, user_question, session = turn
+     
+        from utils.gemini_client import gemini
+        context = build_chat_prompt(chat_context, user_question, session)
+        print("🤖 Streaming AI response...")
+        chunks = gemini.stream(context, timeout=30, label='chat_stream')
+     
+        # The generator runs after the request context is gone
+        db = current_app.db
+        session_oid = session['_id']
+     
+        return Response(
+            chat_event_stream(
+                chunks, user_question,
+                session_id=str(session_oid),
+                on_answer=lambda answer: append_turn(db, session_oid, user_question, answer)
+            ),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # no proxy buffering - flush every frame
+            }
+        )
+     
+    except Exception as e:
+        print(f"\n❌ ERROR in chat_with_report_stream:")
+        print(f"{'='*60}")
+        import traceback
+        traceback.print_exc()
+        print(f"{'='*60}\n")
+        return jsonify({'error': str(e)}), 500
 @report_bp.route('/chat/suggestions/<report_id>', methods=['GET'])
 @jwt_required()
 def get_chat_suggestions(report_id):
@@ -2139,6 +2081,8 @@ def delete_report(report_id):
      
         # Delete from database
         result = reports_collection.delete_one({'_id': ObjectId(report_id)})
+        chat_context_cache.invalidate(report_id)
+        delete_report_sessions(current_app.db, report_id)
      
         # Remove from user's reports array
         users_collection = current_app.db['users']
@@ -0,0 +1,103 @@
+"""
+Upload pipeline when rule-based parsing fails: the saving stage must run
+the AI fallback, report it as the 'ai_fallback' stage and reuse it from
+the report cache on a re-upload.
+
+    python -m unittest discover -s tests     (from backend/)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ai_summarizer, report_pipeline
+from utils.pdf_document import _sample_pdf_bytes
+from utils.template_summarizer import TemplateSummarizer
+
+
+class FakeCollection:
+    """The few pymongo calls the pipeline makes, on _id-keyed dicts"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query, projection=None):
+        return self.docs.get(query.get('_id'))
+
+    def insert_one(self, doc):
+        doc.setdefault('_id', f"id{len(self.docs)}")
+        self.docs[doc['_id']] = doc
+        return mock.Mock(inserted_id=doc['_id'])
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query.get('_id'))
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[query['_id']] = {'_id': query['_id'], **update.get('$setOnInsert', {})}
+        doc.update(update.get('$set', {}))
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class ParseFailureFallbackTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_sample_pdf_bytes(2))
+        self.addCleanup(os.remove, self.path)
+        self.db = FakeDB()
+        self.ai_calls = []
+        for patcher in (
+            mock.patch.object(TemplateSummarizer, 'generate_summary', side_effect=RuntimeError('template broke')),
+            mock.patch.object(ai_summarizer, 'generate_medical_summary',
+                              side_effect=lambda text: self.ai_calls.append('summary') or 'AI summary'),
+            mock.patch.object(ai_summarizer, 'generate_quick_summary',
+                              side_effect=lambda text: self.ai_calls.append('quick') or 'AI quick summary'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self):
+        events = []
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            result = report_pipeline.process_uploaded_report(
+                self.db, 'patient@example.com', self.path, 'report.pdf', 'stored.pdf', 1024,
+                on_stage=lambda stage, status: events.append((stage, status))
+            )
+        return result, events
+
+    def test_fallback_runs_and_reports_its_own_stage(self):
+        result, events = self.upload()
+
+        self.assertEqual(result['method_used'], 'ai_fallback')
+        self.assertEqual(result['plain_language_summary'], 'AI summary')
+        self.assertEqual(self.ai_calls, ['summary', 'quick'])
+        self.assertIn(('ai_enhancement', 'skipped'), events)
+        self.assertNotIn(('ai_enhancement', 'running'), events)
+        self.assertEqual([status for stage, status in events if stage == 'ai_fallback'], ['running', 'done'])
+        self.assertEqual(events[-1], ('saving', 'done'))
+
+    def test_reupload_reuses_cached_fallback(self):
+        self.upload()
+        result, events = self.upload()
+
+        self.assertEqual(self.ai_calls, ['summary', 'quick'])
+        self.assertEqual(result['plain_language_summary'], 'AI summary')
+        self.assertIn('ai_fallback', result['cached_stages'])
+        self.assertIn(('ai_fallback', 'cached'), events)
+
+
+if __name__ == '__main__':
+    unittest.main()
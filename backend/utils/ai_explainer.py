@@ -1,18 +1,60 @@
 # backend/utils/ai_explainer.py
-from groq import Groq
+from groq import Groq, APIConnectionError, InternalServerError, RateLimitError
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+try:
+    from utils.jargon_cache import jargon_cache
+    from utils.jargon_index import normalize_term
+except ImportError:
+    from jargon_cache import jargon_cache
+    from jargon_index import normalize_term
+
 # Load .env from backend root
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-def explain_medical_term(term):
+GROQ_MODEL = "llama-3.3-70b-versatile"
+# Batch endpoint: max terms per request, uncached terms per LLM prompt,
+# LLM prompts in flight per request
+JARGON_BATCH_MAX_TERMS = 25
+JARGON_BATCH_LLM_TERMS = 8
+JARGON_BATCH_CONCURRENCY = 3
+# A batch prompt hit by a rate limit / connection error is retried once after this delay
+JARGON_BATCH_RETRY_DELAY = 2.0
+TRANSIENT_GROQ_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def _explanation(term, data):
+    return {
+        "term": term.capitalize(),
+        "definition": data.get("definition", "No definition available."),
+        "pronunciation": data.get("pronunciation", "Not available"),
+        "example": data.get("example", "No example available.")
+    }
+
+def explain_medical_term(term, db=None):
+    """
+    Patient-friendly explanation of a term. Knowledge-base and previously
+    explained terms come from jargon_cache; only novel terms call Groq.
+    db: MongoDB handle for the shared cache tier (optional)
+    """
+    cached = jargon_cache.get(term, db=db)
+    if cached is not None:
+        return cached
+
     if not client.api_key:
         raise Exception("Groq API key missing. Check .env file.")
 
+    return _explain_single(term, db=db)
+
+
+def _explain_single(term, db=None):
+    """One Groq prompt for one term (no cache lookup); the answer is cached"""
     prompt = f"""
     Explain the medical term "{term}" in simple English for a patient.
     Return ONLY a valid JSON object with these exact keys:
@@ -26,7 +68,7 @@ def explain_medical_term(term):
 
     try:
         response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+            model=GROQ_MODEL,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=150,
             temperature=0.3,
@@ -37,11 +79,124 @@ def explain_medical_term(term):
         # Parse JSON safely
         data = json.loads(text)
         
-        return {
-            "term": term.capitalize(),
-            "definition": data.get("definition", "No definition available."),
-            "pronunciation": data.get("pronunciation", "Not available"),
-            "example": data.get("example", "No example available.")
-        }
+        explanation = _explanation(term, data)
     except Exception as e:
-        raise Exception(f"AI failed: {str(e)}")
\ No newline at end of file
+        raise Exception(f"AI failed: {str(e)}")
+
+    jargon_cache.put(term, explanation, db=db)
+    return explanation
+
+
+# ============================================
+# BATCH
+# ============================================
+
+def _explain_uncached(terms, db=None):
+    """
+    One structured-JSON Groq prompt for several terms. Returns
+    {term: explanation} for the terms the model answered (stored in the cache).
+    """
+    term_list = "\n".join(f"- {term}" for term in terms)
+    prompt = f"""
+    Explain each of these medical terms in simple English for a patient:
+    {term_list}
+    Return ONLY a valid JSON object of this form, one entry per term, in the same order:
+    {{
+      "explanations": [
+        {{
+          "term": "the term exactly as given",
+          "definition": "1-2 sentence definition",
+          "pronunciation": "phonetic spelling",
+          "example": "1 real-life example"
+        }}
+      ]
+    }}
+    No extra text. No markdown. Just JSON.
+    """
+    response = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=150 * len(terms) + 50,
+        temperature=0.3,
+        response_format={ "type": "json_object" }
+    )
+    data = json.loads(response.choices[0].message.content.strip())
+
+    by_key = {normalize_term(term): term for term in terms}
+    answered = {}
+    for entry in data.get("explanations", []):
+        term = by_key.get(normalize_term(str(entry.get("term", ""))))
+        if term is not None and term not in answered:
+            answered[term] = _explanation(term, entry)
+            jargon_cache.put(term, answered[term], db=db)
+    return answered
+
+
+def _explain_chunk(terms, db=None):
+    """
+    A batch prompt (retried once after a rate limit / connection error), then
+    single-term calls only for terms a parsed reply left out. If the batch
+    prompt itself fails, every term gets an error - no call per term.
+    """
+    try:
+        try:
+            answered = _explain_uncached(terms, db=db)
+        except TRANSIENT_GROQ_ERRORS as e:
+            print(f"⚠️ Batch jargon prompt failed ({e}) - retrying in {JARGON_BATCH_RETRY_DELAY:g}s")
+            time.sleep(JARGON_BATCH_RETRY_DELAY)
+            answered = _explain_uncached(terms, db=db)
+    except Exception as e:
+        print(f"❌ Batch jargon prompt failed ({e}) - {len(terms)} term(s) unanswered")
+        return {term: {"term": term.capitalize(), "error": f"AI failed: {str(e)}"} for term in terms}
+
+    results = {}
+    for term in terms:
+        if term in answered:
+            results[term] = answered[term]
+            continue
+        try:
+            results[term] = _explain_single(term, db=db)
+        except Exception as e:
+            results[term] = {"term": term.capitalize(), "error": str(e)}
+    return results
+
+
+def explain_medical_terms(terms, db=None):
+    """
+    Explanations for a list of terms, one per distinct term (normalized
+    spelling) in first-seen order, each with "query" = the term as sent.
+    Cached / knowledge-base terms are answered locally; the rest go to Groq
+    JARGON_BATCH_LLM_TERMS per prompt, up to JARGON_BATCH_CONCURRENCY prompts
+    at a time. Returns (results, stats).
+    """
+    unique = {}
+    for term in terms:
+        key = normalize_term(term)
+        if key and key not in unique:
+            unique[key] = term.strip()
+
+    results = {}
+    uncached = []
+    for term in unique.values():
+        cached = jargon_cache.get(term, db=db)
+        if cached is not None:
+            results[term] = cached
+        else:
+            uncached.append(term)
+
+    if uncached:
+        if not client.api_key:
+            raise Exception("Groq API key missing. Check .env file.")
+        chunks = [uncached[i:i + JARGON_BATCH_LLM_TERMS] for i in range(0, len(uncached), JARGON_BATCH_LLM_TERMS)]
+        print(f"🤖 Explaining {len(uncached)} new term(s) in {len(chunks)} batch prompt(s)")
+        with ThreadPoolExecutor(max_workers=min(JARGON_BATCH_CONCURRENCY, len(chunks))) as pool:
+            for chunk_results in pool.map(lambda chunk: _explain_chunk(chunk, db=db), chunks):
+                results.update(chunk_results)
+
+    stats = {
+        'requested': len(terms),
+        'unique': len(unique),
+        'cached': len(unique) - len(uncached),
+        'llm': len(uncached)
+    }
+    return [dict(results[term], query=term) for term in unique.values()], stats
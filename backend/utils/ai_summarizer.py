@@ -1,116 +1,118 @@
 # backend/utils/ai_summarizer.py
-import requests
-import os
-from dotenv import load_dotenv
 import base64
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+try:
+    from utils.ocr_cache import ocr_cache
+    from utils.gemini_client import gemini, GeminiError, GeminiTimeout, GeminiUnavailable, GEMINI_MODEL
+except ImportError:
+    from ocr_cache import ocr_cache
+    from gemini_client import gemini, GeminiError, GeminiTimeout, GeminiUnavailable, GEMINI_MODEL
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OCR_MODEL = GEMINI_MODEL
+OCR_TIMEOUT = 60  # scanned PDFs are slow
+OCR_PROMPT = "This is a PharmEasy/Thyrocare medical lab report PDF. Extract ALL visible test names, their exact numerical values, units (like mg/dL, %), and any reference ranges or notes. Output in clean plain text format. Preserve as much structure as possible: list each test on a new line like 'TEST NAME: value unit (reference if present)'. Include text from EVERY page, especially tables on pages 3-5. Do NOT summarize, interpret or add explanations — extract raw text only."
+# Cached OCR text is keyed on this, so editing the prompt/model invalidates it
+OCR_PROMPT_VERSION = hashlib.sha256(f"{OCR_MODEL}\n{OCR_PROMPT}".encode('utf-8')).hexdigest()[:12]
+# Concurrent Gemini requests for page-selective OCR (one per run of scanned pages)
+OCR_PAGE_WORKERS = 3
 
-def extract_text_from_pdf_with_ai(filepath):
+def extract_text_from_pdf_with_ai(filepath, file_hash=None, pdf_bytes=None):
     """
     Extract text from PDF using Gemini 2.5 Flash API
-    INCREASED TIMEOUT + RETRY LOGIC for scanned PDFs
+    Up to 60s timeout; transient failures are retried by the shared Gemini
+    client, so a GeminiError (GeminiTimeout, GeminiUnavailable while its
+    circuit breaker is open) reaching the caller must not be retried. Results are cached on disk per file hash + prompt version (see ocr_cache).
+    pdf_bytes: send these bytes instead of the file (e.g. a page subset)
     """
-    max_retries = 2
-    retry_delay = 2  # seconds
+    # Read PDF once - hashed for the cache, base64-encoded for the request
+    if pdf_bytes is None:
+        print("📄 Reading PDF file...")
+        with open(filepath, 'rb') as f:
+            pdf_bytes = f.read()
+    if file_hash is None:
+        file_hash = ocr_cache.file_hash(pdf_bytes)
     
-    for attempt in range(max_retries):
-        try:
-            print(f"\n{'='*60}")
-            print(f"🤖 GEMINI AI OCR - Attempt {attempt + 1}/{max_retries}")
-            print(f"{'='*60}")
-            
-            # Read PDF and convert to base64
-            print("📄 Reading PDF file...")
-            with open(filepath, 'rb') as f:
-                pdf_bytes = f.read()
-                pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-            
-            file_size_kb = len(pdf_bytes) / 1024
-            print(f"📦 File size: {file_size_kb:.2f} KB")
-            
-            # ✅ USING YOUR ORIGINAL WORKING MODEL: gemini-2.5-flash
-            url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "contents": [{
-                    "parts": [
-                        {
-                            "text": "This is a PharmEasy/Thyrocare medical lab report PDF. Extract ALL visible test names, their exact numerical values, units (like mg/dL, %), and any reference ranges or notes. Output in clean plain text format. Preserve as much structure as possible: list each test on a new line like 'TEST NAME: value unit (reference if present)'. Include text from EVERY page, especially tables on pages 3-5. Do NOT summarize, interpret or add explanations — extract raw text only."
-                        },
-                        {
-                            "inline_data": {
-                                "mime_type": "application/pdf",
-                                "data": pdf_base64
-                            }
-                        }
-                    ]
-                }]
+    cached_text = ocr_cache.get(file_hash, OCR_PROMPT_VERSION)
+    if cached_text is not None:
+        print(f"♻️ OCR cache hit ({len(cached_text)} chars) - skipping Gemini call")
+        return cached_text
+    
+    print(f"\n{'='*60}")
+    print(f"🤖 GEMINI AI OCR")
+    print(f"{'='*60}")
+    print(f"📦 File size: {len(pdf_bytes) / 1024:.2f} KB")
+    
+    parts = [
+        {"text": OCR_PROMPT},
+        {
+            "inline_data": {
+                "mime_type": "application/pdf",
+                "data": base64.b64encode(pdf_bytes).decode('utf-8')
             }
-            
-            # ✅ INCREASED TIMEOUT: 60 seconds (was 15)
-            print(f"🚀 Sending request to Gemini API (60s timeout)...")
-            start_time = time.time()
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            
-            elapsed = time.time() - start_time
-            print(f"⏱️ API response time: {elapsed:.2f}s")
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Check if we got a valid response
-                if 'candidates' in result and len(result['candidates']) > 0:
-                    extracted_text = result['candidates'][0]['content']['parts'][0]['text']
-                    
-                    if extracted_text and len(extracted_text.strip()) > 50:
-                        print(f"✅ SUCCESS! Extracted {len(extracted_text)} characters")
-                        print(f"{'='*60}\n")
-                        return extracted_text.strip()
-                    else:
-                        print(f"⚠️ Response too short: {len(extracted_text or '')} chars")
-                else:
-                    print(f"⚠️ Invalid response structure: {result}")
-                
-            else:
-                error_detail = response.json() if response.text else response.text
-                print(f"❌ API Error {response.status_code}: {error_detail}")
-                
-                # Don't retry on 400 errors (bad request)
-                if response.status_code == 400:
-                    raise Exception(f"Gemini API Bad Request: {error_detail}")
-            
-            # If we got here, retry
-            if attempt < max_retries - 1:
-                print(f"🔄 Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-            
-        except requests.Timeout:
-            print(f"⏰ Request timeout after 60s")
-            if attempt < max_retries - 1:
-                print(f"🔄 Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-            else:
-                raise Exception("Gemini API timeout - PDF OCR took too long after 2 attempts")
-                
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
-            if attempt < max_retries - 1 and "timeout" not in str(e).lower():
-                print(f"🔄 Retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-            else:
-                raise Exception(f"PDF extraction failed: {str(e)}")
+        }
+    ]
+    
+    print(f"🚀 Sending request to Gemini API ({OCR_TIMEOUT}s timeout)...")
+    start_time = time.time()
+    try:
+        # OCR latency grows with the page count, so no adaptive timeout from other calls
+        extracted_text = gemini.generate(parts, timeout=OCR_TIMEOUT, model=OCR_MODEL, label='ocr',
+                                         adaptive=False)
+    except GeminiError as e:
+        print(f"❌ Gemini OCR failed: {e}")
+        raise  # already retried by the client - callers must not retry
+    print(f"⏱️ API response time: {time.time() - start_time:.2f}s")
+    
+    if not extracted_text or len(extracted_text.strip()) <= 50:
+        raise Exception(f"PDF extraction failed: response too short ({len(extracted_text or '')} chars)")
     
-    # If all retries failed
-    raise Exception("Gemini API OCR failed after all retry attempts")
+    print(f"✅ SUCCESS! Extracted {len(extracted_text)} characters")
+    print(f"{'='*60}\n")
+    ocr_cache.put(file_hash, OCR_PROMPT_VERSION, extracted_text.strip())
+    return extracted_text.strip()
+
+
+def _page_runs(page_indices):
+    """[0, 1, 2, 5, 7, 8] -> [(0, 2), (5, 5), (7, 8)]"""
+    runs = []
+    for index in sorted(page_indices):
+        if runs and index == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], index)
+        else:
+            runs.append((index, index))
+    return runs
+
+
+def extract_text_from_pages_with_ai(document, page_indices, file_hash=None):
+    """
+    Page-selective OCR for partially scanned PDFs.
+    Each contiguous run of page_indices is split into a smaller PDF and sent
+    to extract_text_from_pdf_with_ai (runs in parallel). Returns
+    {(first, last): text} for the runs that succeeded - see ocr.merge_page_texts.
+    """
+    runs = _page_runs(page_indices)
+    print(f"📸 OCR of {len(page_indices)} scanned page(s) in {len(runs)} request(s)")
+
+    def ocr_run(run):
+        first, last = run
+        pdf_bytes = document.pages_pdf(range(first, last + 1))
+        run_hash = f"{file_hash}-p{first + 1}-{last + 1}" if file_hash else None
+        print(f"📦 Pages {first + 1}-{last + 1}: {len(pdf_bytes) / 1024:.2f} KB "
+              f"(full file {document.size_bytes / 1024:.2f} KB)")
+        return extract_text_from_pdf_with_ai(document.filepath, file_hash=run_hash, pdf_bytes=pdf_bytes)
+
+    ocr_texts = {}
+    with ThreadPoolExecutor(max_workers=min(OCR_PAGE_WORKERS, len(runs)) or 1) as pool:
+        futures = {run: pool.submit(ocr_run, run) for run in runs}
+        for run, future in futures.items():
+            try:
+                ocr_texts[run] = future.result()
+            except Exception as e:
+                print(f"❌ OCR of pages {run[0] + 1}-{run[1] + 1} failed: {e}")
+    return ocr_texts
 
 
 def generate_medical_summary(text):
@@ -119,34 +121,20 @@ def generate_medical_summary(text):
     OPTIONAL - Only used if rule-based system fails
     """
     try:
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
         prompt = f"""Explain this medical report in simple, clear language that a patient can understand. 
 Be concise, encouraging, and avoid medical jargon. Focus on what the results mean in practical terms.
 
 Medical Report:
 {text[:10000]}"""
         
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
-        else:
-            return f"Summary generation failed: API returned {response.status_code}"
+        return gemini.generate(prompt, timeout=30, label='summary')
             
-    except requests.Timeout:
+    except GeminiTimeout:
         return "Summary generation timed out"
+    except GeminiError as e:
+        if e.status_code:
+            return f"Summary generation failed: API returned {e.status_code}"
+        return f"Summary generation failed: {str(e)}"
     except Exception as e:
         return f"Summary generation failed: {str(e)}"
 
@@ -157,34 +145,18 @@ def generate_quick_summary(text):
     OPTIONAL - Only used if rule-based system fails
     """
     try:
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
         prompt = f"""Create exactly 3 bullet points summarizing the key findings of this medical report. 
 Be concise and focus on the most important information.
 
 Medical Report:
 {text[:4000]}"""
         
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=20)
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
-        else:
-            return "Quick summary generation failed"
+        return gemini.generate(prompt, timeout=20, label='quick_summary')
             
-    except requests.Timeout:
+    except GeminiTimeout:
         return "Quick summary timed out"
+    except GeminiError:
+        return "Quick summary generation failed"
     except Exception as e:
         return f"Quick summary failed: {str(e)}"
 
@@ -199,12 +171,6 @@ def enhance_summary_with_ai(rule_based_summary):
     try:
         print("\n🎨 AI Enhancement - Polishing summary...")
         
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
         prompt = f"""You are enhancing a medical report summary. The summary was generated by a rule-based system and contains accurate medical information.
 
 Your job is ONLY to:
@@ -226,23 +192,13 @@ Original rule-based summary:
 
 Enhanced version (keep it similar length, just more conversational, no emojis):"""
         
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
-        }
-        
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            enhanced = result['candidates'][0]['content']['parts'][0]['text']
-            print(f"✅ AI enhancement complete! ({len(enhanced)} chars)")
-            return enhanced
-        else:
-            print(f"⚠️ AI enhancement failed: {response.status_code}")
-            return rule_based_summary  # Fallback to original
+        enhanced = gemini.generate(prompt, timeout=30, label='enhance')
+        print(f"✅ AI enhancement complete! ({len(enhanced)} chars)")
+        return enhanced
             
+    except GeminiError as e:
+        print(f"⚠️ AI enhancement failed: {e.status_code or e}")
+        return rule_based_summary  # Fallback to original
     except Exception as e:
         print(f"⚠️ AI enhancement error: {e}")
         return rule_based_summary  # Fallback to original
\ No newline at end of file
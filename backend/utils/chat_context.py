@@ -0,0 +1,135 @@
+"""
+Precomputed Chat Context
+The report part of every chat prompt (summary + test results) is built once
+at upload time and stored on the report as `chat_context`, so a chat turn
+never loads extracted_text / parsed_data or rebuilds the string.
+
+Each turn does one small read (`chat_context.revision`, which also checks
+ownership); the text itself comes from a per-process LRU and is only
+re-fetched when the revision changed (e.g. after re-verification in another
+Gunicorn worker).
+"""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+# Test results included in the chat prompt
+CHAT_CONTEXT_MAX_TESTS = 20
+CHAT_CONTEXT_CACHE_SIZE = int(os.getenv('CHAT_CONTEXT_CACHE_SIZE', 512))
+
+# Fields needed to build chat_context for reports saved before it existed
+CHAT_CONTEXT_LEGACY_FIELDS = ['plain_language_summary', 'parsed_data.all_results']
+
+
+def build_chat_context(report):
+    """
+    Compact sub-document used by the chat endpoints: the report summary and
+    up to CHAT_CONTEXT_MAX_TESTS test lines, pre-rendered for the prompt
+    """
+    plain_summary = report.get('plain_language_summary', '')
+    parsed_data = report.get('parsed_data') or {}
+
+    text = f"""REPORT SUMMARY:
+{plain_summary}
+AVAILABLE TEST DATA:
+"""
+    tests = 0
+    if parsed_data and 'all_results' in parsed_data:
+        text += "\nTest Results:\n"
+        for test in parsed_data['all_results'][:CHAT_CONTEXT_MAX_TESTS]:
+            term = test.get('term', '')
+            value = test.get('value', '')
+            unit = test.get('unit', '')
+            status = test.get('status', '')
+            if term and value:
+                text += f"- {term}: {value} {unit} ({status})\n"
+                tests += 1
+
+    return {
+        'text': text,
+        'tests': tests,
+        'revision': uuid.uuid4().hex[:12]
+    }
+
+
+class ChatContextCache:
+    """Thread-safe LRU of report id -> chat_context"""
+
+    def __init__(self, max_entries=CHAT_CONTEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, report_id):
+        with self._lock:
+            context = self._entries.get(report_id)
+            if context is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(report_id)
+            self.hits += 1
+            return context
+
+    def put(self, report_id, context):
+        with self._lock:
+            self._entries[report_id] = context
+            self._entries.move_to_end(report_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, report_id):
+        with self._lock:
+            self._entries.pop(report_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Shared per process
+chat_context_cache = ChatContextCache()
+
+
+def get_chat_context(db, report_oid, user_email):
+    """
+    chat_context of the user's report, or None if there is no such report.
+    One small read when the LRU is warm; legacy reports are backfilled.
+    """
+    reports_collection = db['reports']
+    report_id = str(report_oid)
+    query = {'_id': report_oid, 'user_email': user_email}
+
+    cached = chat_context_cache.get(report_id)
+    if cached is not None:
+        # Warm: confirm ownership + revision only
+        head = reports_collection.find_one(query, {'chat_context.revision': 1})
+        if head is None:
+            return None  # deleted, or not this user's report
+        if (head.get('chat_context') or {}).get('revision') == cached['revision']:
+            return cached
+
+    report = reports_collection.find_one(query, {'chat_context': 1})
+    if report is None:
+        return None
+    context = report.get('chat_context')
+
+    if context is None:
+        legacy = reports_collection.find_one(
+            {'_id': report_oid},
+            {field: 1 for field in CHAT_CONTEXT_LEGACY_FIELDS}
+        )
+        context = build_chat_context(legacy)
+        reports_collection.update_one({'_id': report_oid}, {'$set': {'chat_context': context}})
+
+    chat_context_cache.put(report_id, context)
+    return context
@@ -0,0 +1,264 @@
+"""
+Server-Side Chat Sessions
+Conversations are stored per report in `chat_sessions`, so the client only
+sends its question + session_id. The newest messages are kept verbatim;
+once there are more than CHAT_RECENT_MAX of them the oldest are folded into
+a rolling summary (Gemini, with an extractive fallback) in the background.
+build_chat_prompt() fills a fixed token budget: instructions, report
+context and question first, then the summary, then as many recent messages
+as fit - so prompt size is bounded however long the conversation gets.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+CHAT_SESSIONS_COLLECTION = 'chat_sessions'
+CHAT_SESSION_TTL_DAYS = int(os.getenv('CHAT_SESSION_TTL_DAYS', 30))
+
+# Verbatim messages: fold when there are more than MAX, keep the newest KEEP
+CHAT_RECENT_MAX = 8
+CHAT_RECENT_KEEP = 4
+# Rolling summary length cap (characters)
+CHAT_SUMMARY_MAX_CHARS = 1200
+# Whole prompt budget (estimated tokens)
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv('CHAT_PROMPT_TOKEN_BUDGET', 3000))
+# Longer questions are clipped in the prompt so the budget holds
+CHAT_QUESTION_MAX_CHARS = 2000
+CHAT_SUMMARY_TIMEOUT = 15
+
+CHAT_INSTRUCTIONS = """
+INSTRUCTIONS:
+1. Answer the user's question based on the report data above
+2. Be clear, accurate, and helpful
+3. Cite specific test values when relevant
+4. Use simple language, avoid medical jargon unless necessary
+5. If the report doesn't contain info to answer the question, say so politely
+6. Add disclaimers when giving medical advice
+7. Keep responses concise but informative
+USER QUESTION: {question}
+Provide a helpful, accurate answer:"""
+SUMMARY_HEADER = "EARLIER CONVERSATION (SUMMARY):\n"
+HISTORY_HEADER = "CONVERSATION HISTORY:\n"
+
+_fold_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-fold')
+_folding = set()
+_folding_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+# ============================================
+# SESSIONS
+# ============================================
+
+def get_or_create_session(db, report_id, user_email, session_id=None, seed_history=None):
+    """
+    The user's session for this report, or a new one when session_id is
+    missing, expired (TTL) or not theirs.
+    seed_history: messages from a client that still sends `history`
+    """
+    sessions = db[CHAT_SESSIONS_COLLECTION]
+
+    if session_id:
+        from bson import ObjectId
+        from bson.errors import InvalidId
+        try:
+            session = sessions.find_one(
+                {'_id': ObjectId(session_id), 'report_id': report_id, 'user_email': user_email},
+                {'summary': 1, 'messages': 1, 'turns': 1}
+            )
+            if session is not None:
+                return session
+        except (InvalidId, TypeError):
+            pass
+        print(f"⚠️ Chat session {session_id} not found - starting a new one")
+
+    now = datetime.utcnow()
+    messages = [
+        {'role': msg['role'], 'content': msg['content']}
+        for msg in (seed_history or [])[-CHAT_RECENT_KEEP:]
+        if msg.get('role') in ('user', 'assistant') and msg.get('content')
+    ]
+    session = {
+        'report_id': report_id,
+        'user_email': user_email,
+        'summary': '',
+        'summary_version': 0,
+        'messages': messages,
+        'turns': 0,
+        'created_at': now,
+        'updated_at': now
+    }
+    session['_id'] = sessions.insert_one(session).inserted_id
+    return session
+
+
+def append_turn(db, session_id, question, answer):
+    """
+    Store one question/answer pair and schedule a fold when the session grew
+    too long. A failed write is logged, never raised: the answer was
+    already produced.
+    """
+    try:
+        db[CHAT_SESSIONS_COLLECTION].update_one(
+            {'_id': session_id},
+            {
+                '$push': {'messages': {'$each': [
+                    {'role': 'user', 'content': question},
+                    {'role': 'assistant', 'content': answer}
+                ]}},
+                '$inc': {'turns': 1},
+                '$set': {'updated_at': datetime.utcnow()}
+            }
+        )
+    except Exception as e:
+        print(f"⚠️ Could not save chat turn to session {session_id}: {e}")
+        return
+    schedule_fold(db, session_id)
+
+
+def delete_report_sessions(db, report_id):
+    db[CHAT_SESSIONS_COLLECTION].delete_many({'report_id': report_id})
+
+
+# ============================================
+# ROLLING SUMMARY
+# ============================================
+
+def schedule_fold(db, session_id):
+    """Fold old messages into the summary off the request path (one fold per session at a time)"""
+    with _folding_lock:
+        if session_id in _folding:
+            return
+        _folding.add(session_id)
+
+    def run():
+        try:
+            fold_session(db, session_id)
+        except Exception as e:
+            print(f"⚠️ Chat summary fold failed for {session_id}: {e}")
+        finally:
+            with _folding_lock:
+                _folding.discard(session_id)
+
+    _fold_pool.submit(run)
+
+
+def fold_session(db, session_id, summarize=None):
+    """
+    If the session holds more than CHAT_RECENT_MAX messages, merge all but
+    the newest CHAT_RECENT_KEEP into the summary. The update is conditional
+    on summary_version and removes exactly the folded messages, so turns
+    appended meanwhile are never lost. Returns True if it folded.
+    """
+    sessions = db[CHAT_SESSIONS_COLLECTION]
+    session = sessions.find_one(
+        {'_id': session_id},
+        {'summary': 1, 'summary_version': 1, 'messages': 1}
+    )
+    if not session or len(session.get('messages', [])) <= CHAT_RECENT_MAX:
+        return False
+
+    messages = session['messages']
+    folded = messages[:len(messages) - CHAT_RECENT_KEEP]
+    summary = (summarize or summarize_messages)(session.get('summary', ''), folded)
+    version = session.get('summary_version', 0)
+
+    result = sessions.update_one(
+        {'_id': session_id, 'summary_version': version},
+        [{'$set': {
+            'summary': summary,
+            'summary_version': version + 1,
+            'messages': {'$slice': ['$messages', len(folded), {'$max': [{'$size': '$messages'}, 1]}]}
+        }}]
+    )
+    if result.modified_count:
+        print(f"🗜️ Chat session {session_id}: folded {len(folded)} messages into the summary")
+    return bool(result.modified_count)
+
+
+def summarize_messages(summary, messages):
+    """Updated rolling summary via Gemini; extractive fallback if it is unavailable"""
+    transcript = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+    prompt = f"""Update the running summary of a conversation between a patient and a medical report assistant.
+Keep the test names, values and concerns the patient asked about, and any advice given.
+Write at most 120 words of plain text.
+
+SUMMARY SO FAR:
+{summary or '(none)'}
+
+NEW MESSAGES:
+{transcript}
+
+UPDATED SUMMARY:"""
+    try:
+        from utils.gemini_client import gemini
+        updated = gemini.generate(prompt, timeout=CHAT_SUMMARY_TIMEOUT, label='chat_summary', max_retries=0)
+        if updated and updated.strip():
+            return _clip_summary(updated.strip())
+    except Exception as e:
+        print(f"⚠️ AI chat summary unavailable ({e}) - using extractive summary")
+    return extractive_summary(summary, messages)
+
+
+def extractive_summary(summary, messages):
+    """First sentence of each message appended to the summary, oldest text dropped past the cap"""
+    lines = [summary] if summary else []
+    for msg in messages:
+        first_sentence = re.split(r'(?<=[.!?])\s', msg['content'].strip(), maxsplit=1)[0]
+        lines.append(f"{msg['role'].upper()}: {first_sentence[:160]}")
+    return _clip_summary("\n".join(lines))
+
+
+def _clip_summary(text):
+    if len(text) <= CHAT_SUMMARY_MAX_CHARS:
+        return text
+    return "…" + text[-(CHAT_SUMMARY_MAX_CHARS - 1):]
+
+
+# ============================================
+# PROMPT
+# ============================================
+
+def build_chat_prompt(chat_context, user_question, session=None, budget=CHAT_PROMPT_TOKEN_BUDGET):
+    """
+    Gemini prompt for a chat turn within `budget` estimated tokens:
+    report context + instructions + question always (question clipped to
+    CHAT_QUESTION_MAX_CHARS, report text clipped if even that does not fit),
+    then the rolling summary, then the newest session messages that still fit
+    """
+    # Accounted in characters: estimate_tokens(prompt) <= budget
+    room = budget * 4 - 1
+
+    intro = "You are a helpful medical assistant analyzing a patient's medical report.\n"
+    instructions = CHAT_INSTRUCTIONS.format(question=user_question[:CHAT_QUESTION_MAX_CHARS])
+    report_text = chat_context['text'][:max(0, room - len(intro) - len(instructions))]
+    context = intro + report_text + instructions
+    room -= len(context)
+
+    header = ""
+    summary = (session or {}).get('summary') or ''
+    if summary and room > len(SUMMARY_HEADER) + 2:
+        summary = summary[-(room - len(SUMMARY_HEADER) - 2):]
+        header += SUMMARY_HEADER + summary + "\n\n"
+        room -= len(SUMMARY_HEADER) + len(summary) + 2
+
+    conversation = []
+    room -= len(HISTORY_HEADER) + 1   # + "\n\n" after the last line
+    for msg in reversed((session or {}).get('messages') or []):
+        line = f"{msg['role'].upper()}: {msg['content']}"
+        if len(line) + 1 > room:
+            break
+        conversation.append(line)
+        room -= len(line) + 1
+    conversation.reverse()
+
+    if conversation:
+        header += HISTORY_HEADER + "\n".join(conversation) + "\n\n"
+    return header + context
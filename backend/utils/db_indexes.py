@@ -0,0 +1,193 @@
+"""
+MongoDB Index Manager
+Declares the indexes behind every hot query in routes/ and creates them at
+startup (idempotent). Can also explain() those queries and fail if any of
+them still falls back to a COLLSCAN.
+
+Usage:
+    python utils/db_indexes.py                 # create indexes on MONGODB_URI
+    python utils/db_indexes.py --verify        # create + check query plans
+    python utils/db_indexes.py --verify --uri mongodb://localhost:27017/plan_check
+"""
+
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+try:
+    from utils.report_cache import REPORT_CACHE_TTL_DAYS
+    from utils.chat_sessions import CHAT_SESSION_TTL_DAYS
+    from utils.jargon_cache import JARGON_CACHE_TTL_DAYS
+except ImportError:
+    from report_cache import REPORT_CACHE_TTL_DAYS
+    from chat_sessions import CHAT_SESSION_TTL_DAYS
+    from jargon_cache import JARGON_CACHE_TTL_DAYS
+
+# collection → list of (keys, options)
+INDEXES = {
+    'reports': [
+        # /history: user's reports, newest first, keyset + from/to range on uploaded_at
+        ([('user_email', ASCENDING), ('uploaded_at', DESCENDING), ('_id', DESCENDING)],
+         {'name': 'user_uploaded_at'}),
+    ],
+    'users': [
+        ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+        ([('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+    ],
+    'password_resets': [
+        ([('token', ASCENDING)], {'name': 'token_unique', 'unique': True}),
+        # Expired reset tokens are removed by MongoDB's TTL monitor
+        ([('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+    ],
+    'report_cache': [
+        # Unused cache entries expire (last_used_at is refreshed on every hit)
+        ([('last_used_at', ASCENDING)],
+         {'name': 'last_used_ttl', 'expireAfterSeconds': REPORT_CACHE_TTL_DAYS * 24 * 3600}),
+    ],
+    'report_jobs': [
+        # Workers claim the oldest queued job; stale-job recovery uses the status prefix
+        ([('status', ASCENDING), ('created_at', ASCENDING)], {'name': 'queue_order'}),
+    ],
+    'chat_sessions': [
+        # Report deletion removes its sessions
+        ([('report_id', ASCENDING)], {'name': 'report_id'}),
+        # Idle sessions expire (updated_at is refreshed on every turn)
+        ([('updated_at', ASCENDING)],
+         {'name': 'updated_at_ttl', 'expireAfterSeconds': CHAT_SESSION_TTL_DAYS * 24 * 3600}),
+    ],
+    'jargon_cache': [
+        # LLM explanations are refreshed after the TTL
+        ([('created_at', ASCENDING)],
+         {'name': 'created_at_ttl', 'expireAfterSeconds': JARGON_CACHE_TTL_DAYS * 24 * 3600}),
+    ],
+}
+
+# Indexes superseded by the ones above, dropped on startup
+OBSOLETE_INDEXES = {
+    'reports': ['user_history'],
+}
+
+# Stages that mean "no index used"
+_COLLSCAN_STAGES = {'COLLSCAN'}
+
+
+def ensure_indexes(db):
+    """Create every declared index; returns {collection: [index names]}"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                name = db[collection].create_index(keys, **options)
+                created.setdefault(collection, []).append(name)
+            except OperationFailure as e:
+                # e.g. duplicate emails already stored - keep the app running
+                print(f"⚠️ Could not create index {options.get('name')} on {collection}: {e}")
+
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = db[collection].index_information()
+        for name in names:
+            if name in existing:
+                db[collection].drop_index(name)
+    return created
+
+
+def _hot_queries(db):
+    """(label, cursor) for the queries the routes run on every request"""
+    from bson import ObjectId
+
+    sample_id = ObjectId()
+    sample_email = 'plan-check@example.com'
+    now = datetime.utcnow()
+    history_order = [('uploaded_at', -1), ('_id', -1)]
+    return [
+        ('reports: history page',
+         db['reports'].find({'user_email': sample_email}).sort(history_order).limit(51)),
+        ('reports: history next page',
+         db['reports'].find({
+             'user_email': sample_email,
+             '$or': [
+                 {'uploaded_at': {'$lt': now}},
+                 {'uploaded_at': now, '_id': {'$lt': sample_id}}
+             ]
+         }).sort(history_order).limit(51)),
+        ('reports: history date range',
+         db['reports'].find({
+             'user_email': sample_email,
+             'uploaded_at': {'$gte': now - timedelta(days=30), '$lt': now}
+         }).sort(history_order).limit(51)),
+        ('reports: owned report lookup',
+         db['reports'].find({'_id': sample_id, 'user_email': sample_email}).limit(1)),
+        ('users: login by email',
+         db['users'].find({'email': sample_email}).limit(1)),
+        ('users: signup username check',
+         db['users'].find({'username': 'plan-check'}).limit(1)),
+        ('password_resets: token lookup',
+         db['password_resets'].find({
+             'token': 'plan-check',
+             'used': False,
+             'expires_at': {'$gt': datetime.utcnow()}
+         }).limit(1)),
+        ('report_jobs: claim next job',
+         db['report_jobs'].find({'status': 'queued'}).sort('created_at', 1).limit(1)),
+    ]
+
+
+def _plan_stages(plan):
+    """Flatten every stage name in an explain() plan tree"""
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+def verify_query_plans(db):
+    """
+    explain() each hot query and report its winning plan stages.
+    Returns a list of {'query', 'stages', 'ok'} dicts.
+    """
+    results = []
+    for label, cursor in _hot_queries(db):
+        winning_plan = cursor.explain()['queryPlanner']['winningPlan']
+        stages = _plan_stages(winning_plan)
+        results.append({
+            'query': label,
+            'stages': stages,
+            'ok': not _COLLSCAN_STAGES.intersection(stages)
+        })
+    return results
+
+
+# ============================================
+# CLI
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Create MongoDB indexes and check query plans')
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/medical_report_db'))
+    parser.add_argument('--verify', action='store_true', help='explain() hot queries and fail on COLLSCAN')
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri).get_database()
+
+    for collection, names in ensure_indexes(db).items():
+        print(f"✅ {collection}: {', '.join(names)}")
+
+    if args.verify:
+        results = verify_query_plans(db)
+        for result in results:
+            mark = '✅' if result['ok'] else '❌'
+            print(f"{mark} {result['query']:35} {' → '.join(result['stages'])}")
+        if not all(result['ok'] for result in results):
+            sys.exit(1)
@@ -0,0 +1,655 @@
+"""
+Shared Gemini API Client
+One pooled requests.Session per process (keep-alive, so repeated calls reuse
+the TLS connection), unified timeouts, retry with exponential backoff + full
+jitter on transient failures, and per-call latency metrics. stream()
+relays streamGenerateContent (SSE) chunks as they arrive.
+
+Every call goes through a per-process circuit breaker: after
+GEMINI_BREAKER_FAILURES consecutive upstream failures calls fail fast with
+GeminiUnavailable for GEMINI_BREAKER_RESET_SECONDS, then a single half-open
+probe decides whether to close it again. Read timeouts adapt to observed
+latency: once a label has enough successful samples its timeout shrinks to
+GEMINI_TIMEOUT_MULTIPLIER x p95 (never above the caller's timeout). A call
+cut short by the adaptive timeout is retried once with the caller's full
+timeout and does not count towards the breaker.
+
+Point GEMINI_BASE_URL at a local server to test without the real API:
+    python utils/gemini_client.py --self-test
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1")
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Connections kept alive per process (Gunicorn worker)
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", 8))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", 5))
+GEMINI_DEFAULT_TIMEOUT = 30
+# Extra attempts after the first one for timeouts, connection errors, 429 and 5xx
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 1))
+GEMINI_BACKOFF_BASE = 1.0
+GEMINI_BACKOFF_CAP = 8.0
+
+# Latency samples kept per call label for percentiles
+LATENCY_WINDOW = 200
+
+# Circuit breaker (per process)
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", 30))
+
+# Adaptive read timeout: multiplier x p95 of successful calls, within
+# [GEMINI_MIN_TIMEOUT, caller's timeout], once ADAPTIVE_MIN_SAMPLES are seen
+GEMINI_TIMEOUT_MULTIPLIER = float(os.getenv("GEMINI_TIMEOUT_MULTIPLIER", 3))
+GEMINI_MIN_TIMEOUT = float(os.getenv("GEMINI_MIN_TIMEOUT", 5))
+ADAPTIVE_MIN_SAMPLES = 20
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Gemini call failed (HTTP error, bad response or transport error)"""
+
+    def __init__(self, message, status_code=None, detail=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class GeminiTimeout(GeminiError):
+    """Gemini did not answer within the read timeout"""
+
+
+class GeminiUnavailable(GeminiError):
+    """Circuit breaker is open - the call was not attempted"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed → (failure_threshold consecutive failures) → open
+    open → (reset_timeout elapsed) → half-open: one probe call is let through
+    half-open → probe succeeds → closed / probe fails → open again
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=GEMINI_BREAKER_FAILURES,
+                 reset_timeout=GEMINI_BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._rejected = 0
+        self._opened = 0
+
+    def allow(self):
+        """True if a call may go out now (claims the probe when half-open)"""
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.CLOSED:
+                return True
+            # A probe that never reported back (crashed caller) is replaced after reset_timeout
+            if self._state == self.HALF_OPEN and (
+                    not self._probing or self.clock() - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = self.clock()
+                return True
+            self._rejected += 1
+            return False
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed"""
+        with self._lock:
+            return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._opened += 1
+                    print(f"🚫 Gemini circuit OPEN after {self._failures} failure(s) - "
+                          f"failing fast for {self.reset_timeout:g}s")
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self._probing = False
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'times_opened': self._opened,
+                'rejected_calls': self._rejected,
+            }
+
+
+class GeminiClient:
+
+    def __init__(self, api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL,
+                 pool_size=GEMINI_POOL_SIZE, max_retries=GEMINI_MAX_RETRIES, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+        self._session_pid = None
+        self._urls = {}
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    # ============================================
+    # CONNECTION POOL
+    # ============================================
+
+    @property
+    def session(self):
+        """Pooled session, recreated after fork so workers never share sockets"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({"Content-Type": "application/json"})
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _url(self, model, method='generateContent'):
+        url = self._urls.get((model, method))
+        if url is None:
+            url = self._urls[(model, method)] = f"{self.base_url}/models/{model}:{method}"
+        return url
+
+    # ============================================
+    # CALLS
+    # ============================================
+
+    def generate(self, parts, timeout=GEMINI_DEFAULT_TIMEOUT, model=GEMINI_MODEL,
+                 label='generate', max_retries=None, adaptive=True):
+        """
+        Run generateContent and return the first candidate's text.
+        parts: prompt string or a list of Gemini content parts.
+        timeout: upper bound for the read timeout (see timeout_for).
+        adaptive: False always waits the full timeout (calls whose latency
+                  depends on the input size, e.g. OCR of N pages).
+        Raises GeminiUnavailable at once while the circuit is open, and
+        GeminiTimeout / GeminiError once retries are exhausted.
+        """
+        if isinstance(parts, str):
+            parts = [{"text": parts}]
+        payload = {"contents": [{"parts": parts}]}
+        retries = self.max_retries if max_retries is None else max_retries
+
+        attempt = 0
+        full_timeout = not adaptive
+        extended = False
+        while True:
+            # An adaptive-timeout retry already holds the breaker's permission
+            if not extended and not self.breaker.allow():
+                self._record(label, None, ok=False, retries=attempt, rejected=True)
+                retry_after = self.breaker.retry_after()
+                raise GeminiUnavailable(
+                    f"Gemini temporarily unavailable (circuit open, retry in {retry_after:.0f}s)",
+                    retry_after=retry_after
+                )
+
+            read_timeout = timeout if full_timeout else self.timeout_for(label, timeout)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self._url(model),
+                    params={"key": self.api_key},
+                    json=payload,
+                    timeout=(GEMINI_CONNECT_TIMEOUT, read_timeout)
+                )
+                error = self._check_response(response)
+            except requests.Timeout:
+                error = GeminiTimeout(f"Gemini API timeout after {read_timeout:.1f}s")
+            except requests.RequestException as e:
+                error = GeminiError(f"Gemini API request failed: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if error is None:
+                try:
+                    text = response.json()['candidates'][0]['content']['parts'][0]['text']
+                except (ValueError, KeyError, IndexError, TypeError):
+                    error = GeminiError("Invalid Gemini response structure", response.status_code)
+                else:
+                    self.breaker.record_success()
+                    self._record(label, elapsed_ms, ok=True, retries=attempt)
+                    return text
+
+            if isinstance(error, GeminiTimeout) and read_timeout < timeout:
+                # The adaptive budget was too tight for this call, which says
+                # nothing about the upstream: try again with the caller's timeout
+                full_timeout = extended = True
+                print(f"🔄 Gemini {label}: {error} (adaptive) - retrying with {timeout:.0f}s")
+                continue
+            extended = False
+
+            retryable = isinstance(error, GeminiTimeout) or error.status_code is None \
+                or error.status_code in RETRYABLE_STATUS
+            if retryable:
+                self.breaker.record_failure()
+            else:
+                # Gemini answered (4xx / bad payload) - the upstream itself is healthy
+                self.breaker.record_success()
+            if not retryable or attempt >= retries:
+                self._record(label, elapsed_ms, ok=False, retries=attempt)
+                raise error
+
+            attempt += 1
+            delay = random.uniform(0, min(GEMINI_BACKOFF_CAP, GEMINI_BACKOFF_BASE * 2 ** attempt))
+            print(f"🔄 Gemini {label}: {error} - retry {attempt}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stream(self, parts, timeout=GEMINI_DEFAULT_TIMEOUT, model=GEMINI_MODEL, label='stream'):
+        """
+        streamGenerateContent over SSE: yields text chunks as Gemini produces
+        them. The wait for the first chunk is adaptive, like generate() - a
+        miss is retried once with the full timeout, not counted by the
+        breaker; every later chunk may take up to the full timeout.
+        Not retried otherwise - connection/HTTP errors before the first chunk
+        raise like generate(). Closing the generator drops the upstream
+        connection. Latency metrics for the label are time-to-first-chunk.
+        """
+        if isinstance(parts, str):
+            parts = [{"text": parts}]
+        payload = {"contents": [{"parts": parts}]}
+
+        full_timeout = False
+        while True:
+            # An adaptive-timeout retry already holds the breaker's permission
+            if not full_timeout and not self.breaker.allow():
+                self._record(label, None, ok=False, retries=0, rejected=True)
+                retry_after = self.breaker.retry_after()
+                raise GeminiUnavailable(
+                    f"Gemini temporarily unavailable (circuit open, retry in {retry_after:.0f}s)",
+                    retry_after=retry_after
+                )
+
+            read_timeout = timeout if full_timeout else self.timeout_for(label, timeout)
+            start = time.perf_counter()
+            response = None
+            texts = None
+            first_text = None
+            try:
+                response = self.session.post(
+                    self._url(model, 'streamGenerateContent'),
+                    params={"key": self.api_key, "alt": "sse"},
+                    json=payload,
+                    timeout=(GEMINI_CONNECT_TIMEOUT, read_timeout),
+                    stream=True
+                )
+                error = self._check_response(response)
+                if error is None:
+                    texts = self._sse_texts(response)
+                    first_text = next(texts, None)
+            except requests.Timeout:
+                error = GeminiTimeout(f"Gemini API timeout after {read_timeout:.1f}s")
+            except requests.RequestException as e:
+                error = GeminiTimeout(f"Gemini API timeout after {read_timeout:.1f}s") \
+                    if 'timed out' in str(e).lower() else GeminiError(f"Gemini API request failed: {e}")
+            if error is None:
+                break
+
+            if response is not None:
+                response.close()
+            if isinstance(error, GeminiTimeout) and read_timeout < timeout:
+                full_timeout = True
+                print(f"🔄 Gemini {label}: {error} (adaptive) - retrying with {timeout:.0f}s")
+                continue
+            if isinstance(error, GeminiTimeout) or error.status_code is None \
+                    or error.status_code in RETRYABLE_STATUS:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._record(label, (time.perf_counter() - start) * 1000, ok=False, retries=0)
+            raise error
+
+        first_chunk_ms = (time.perf_counter() - start) * 1000
+        # Pauses between chunks are not time-to-first-chunk: allow the full timeout
+        self._set_read_timeout(response, timeout)
+        outcome = 'error'
+        try:
+            if first_text is not None:
+                yield first_text
+                for text in texts:
+                    yield text
+            outcome = 'ok'
+        except GeneratorExit:
+            outcome = 'closed'  # consumer went away - not an upstream failure
+            raise
+        except requests.RequestException as e:
+            raise GeminiTimeout(f"Gemini stream stalled: {e}") if 'timed out' in str(e).lower() \
+                else GeminiError(f"Gemini stream interrupted: {e}")
+        finally:
+            response.close()
+            if outcome == 'error':
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._record(label, first_chunk_ms, ok=outcome != 'error', retries=0)
+
+    @staticmethod
+    def _sse_texts(response):
+        """Text of each SSE event of a streamGenerateContent response"""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            try:
+                chunk = json.loads(line[5:])
+                text = ''.join(part.get('text', '') for part in chunk['candidates'][0]['content']['parts'])
+            except (ValueError, KeyError, IndexError, TypeError):
+                continue  # e.g. a final chunk that only carries usage metadata
+            if text:
+                yield text
+
+    @staticmethod
+    def _set_read_timeout(response, seconds):
+        """Read timeout of an open streamed response (its urllib3 connection's socket)"""
+        sock = getattr(getattr(response.raw, '_connection', None), 'sock', None)
+        if sock is not None:
+            sock.settimeout(seconds)
+
+    def adaptive_timeout(self, label):
+        """
+        GEMINI_TIMEOUT_MULTIPLIER x p95 of recent successful calls with this
+        label (at least GEMINI_MIN_TIMEOUT), or None until enough samples
+        """
+        with self._lock:
+            entry = self._metrics.get(label)
+            samples = sorted(entry['success_ms']) if entry else []
+        if len(samples) < ADAPTIVE_MIN_SAMPLES:
+            return None
+        p95_s = samples[min(len(samples) - 1, int(len(samples) * 0.95))] / 1000
+        return max(GEMINI_MIN_TIMEOUT, p95_s * GEMINI_TIMEOUT_MULTIPLIER)
+
+    def timeout_for(self, label, timeout=GEMINI_DEFAULT_TIMEOUT):
+        """Read timeout for the next call: the adaptive one, capped at timeout"""
+        adaptive = self.adaptive_timeout(label)
+        return timeout if adaptive is None else min(timeout, adaptive)
+
+    @staticmethod
+    def _check_response(response):
+        if response.status_code == 200:
+            return None
+        try:
+            detail = response.json()
+        except ValueError:
+            detail = response.text
+        return GeminiError(
+            f"Gemini API Error {response.status_code}: {detail}",
+            status_code=response.status_code,
+            detail=detail
+        )
+
+    # ============================================
+    # METRICS
+    # ============================================
+
+    def _record(self, label, elapsed_ms, ok, retries, rejected=False):
+        with self._lock:
+            entry = self._metrics.get(label)
+            if entry is None:
+                entry = self._metrics[label] = {
+                    'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0,
+                    'latencies_ms': deque(maxlen=LATENCY_WINDOW),
+                    'success_ms': deque(maxlen=LATENCY_WINDOW)
+                }
+            entry['calls'] += 1
+            entry['retries'] += retries
+            if rejected:
+                entry['rejected'] += 1
+                return
+            if not ok:
+                entry['errors'] += 1
+            else:
+                entry['success_ms'].append(elapsed_ms)
+            entry['latencies_ms'].append(elapsed_ms)
+
+    def metrics(self):
+        """
+        {label: {calls, errors, retries, rejected, p50_ms, p95_ms, max_ms,
+        adaptive_timeout_s}} for this process, plus the circuit state under 'circuit'
+        """
+        with self._lock:
+            snapshot = {label: dict(entry, latencies_ms=sorted(entry['latencies_ms']))
+                        for label, entry in self._metrics.items()}
+        result = {}
+        for label, entry in snapshot.items():
+            latencies = entry.pop('latencies_ms')
+            del entry['success_ms']
+            if latencies:
+                entry['p50_ms'] = round(latencies[len(latencies) // 2], 1)
+                entry['p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+                entry['max_ms'] = round(latencies[-1], 1)
+            adaptive = self.adaptive_timeout(label)
+            entry['adaptive_timeout_s'] = round(adaptive, 1) if adaptive is not None else None
+            result[label] = entry
+        result['circuit'] = self.breaker.status()
+        return result
+
+
+# Shared per process
+gemini = GeminiClient()
+
+
+# ============================================
+# SELF-TEST AGAINST A LOCAL FAKE GEMINI SERVER
+# ============================================
+
+def _self_test():
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'requests': 0, 'connections': set(), 'down': False,
+             'streams_completed': 0, 'streams_dropped': 0}
+
+    class FakeGemini(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_POST(self):
+            state['requests'] += 1
+            state['connections'].add(self.client_address)
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = body['contents'][0]['parts'][0]['text']
+
+            if prompt.startswith('slow:'):
+                time.sleep(float(prompt.split(':')[1]))
+            if 'streamGenerateContent' in self.path and not state['down']:
+                return self._stream(prompt)
+            if state['down']:
+                status, reply = 503, {'error': {'message': 'unavailable'}}
+            elif prompt == 'flaky' and state['requests'] % 2 == 1:
+                status, reply = 503, {'error': {'message': 'overloaded'}}
+            elif prompt == 'bad':
+                status, reply = 400, {'error': {'message': 'bad request'}}
+            else:
+                status, reply = 200, {'candidates': [{'content': {'parts': [{'text': f"echo: {prompt}"}]}}]}
+
+            data = json.dumps(reply).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except OSError:
+                pass  # client gave up (timeout test)
+
+        def _stream(self, prompt):
+            # SSE over chunked transfer: one word every 50 ms
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                if prompt.startswith('late:'):
+                    time.sleep(float(prompt.split(':')[1]))
+                for index, word in enumerate(f"streamed answer to {prompt}".split(' ')):
+                    if index == 1 and prompt.startswith('gap:'):
+                        time.sleep(float(prompt.split(':')[1]))
+                    event = {'candidates': [{'content': {'parts': [{'text': word + ' '}]}}]}
+                    data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                    time.sleep(0.05)
+                self.wfile.write(b"0\r\n\r\n")
+                state['streams_completed'] += 1
+            except OSError:
+                state['streams_dropped'] += 1  # client closed the stream
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    client = GeminiClient(api_key='test', base_url=base_url)
+
+    # Pooling, retry of 5xx, no retry of 4xx
+    for i in range(20):
+        assert client.generate(f"hello {i}", label='echo') == f"echo: hello {i}"
+    assert client.generate('flaky', label='flaky', max_retries=2) == 'echo: flaky'
+    try:
+        client.generate('bad', label='bad')
+        raise AssertionError('400 must not be retried')
+    except GeminiError as e:
+        assert e.status_code == 400
+    print(f"✅ {state['requests']} requests over {len(state['connections'])} connection(s)")
+
+    # Adaptive timeout: fast history shrinks a 60s budget to the floor
+    assert client.timeout_for('echo', 60) == GEMINI_MIN_TIMEOUT, client.timeout_for('echo', 60)
+    start = time.perf_counter()
+    try:
+        client.generate('slow:1', label='slow', timeout=0.2, max_retries=0)
+        raise AssertionError('slow call must time out')
+    except GeminiTimeout:
+        pass
+    assert time.perf_counter() - start < 0.9
+    print(f"✅ adaptive timeout for 'echo': {client.timeout_for('echo', 60):.1f}s (cap 60s)")
+
+    # A call slower than the adaptive timeout gets the caller's full timeout
+    assert client.generate(f'slow:{GEMINI_MIN_TIMEOUT + 0.5}', label='echo', timeout=GEMINI_MIN_TIMEOUT + 3,
+                           max_retries=0) == f'echo: slow:{GEMINI_MIN_TIMEOUT + 0.5}'
+    print("✅ adaptive timeout miss retried with the full timeout")
+
+    # Streaming: first chunk long before the whole answer
+    start = time.perf_counter()
+    chunks = []
+    for text in client.stream('hi', label='stream'):
+        if not chunks:
+            first_ms = (time.perf_counter() - start) * 1000
+        chunks.append(text)
+    total_ms = (time.perf_counter() - start) * 1000
+    assert ''.join(chunks) == 'streamed answer to hi ', chunks
+    assert first_ms < total_ms / 2, (first_ms, total_ms)
+    stream = client.stream('bye', label='stream')
+    next(stream)
+    stream.close()  # client disconnect: upstream connection is dropped
+    time.sleep(0.2)
+    assert state['streams_dropped'] == 1 and client.breaker.status()['state'] == CircuitBreaker.CLOSED
+    print(f"✅ stream: first chunk {first_ms:.0f} ms, full answer {total_ms:.0f} ms ({len(chunks)} chunks)")
+
+    # Stream timeouts: adaptive only up to the first chunk, full timeout between chunks
+    for i in range(ADAPTIVE_MIN_SAMPLES):
+        list(client.stream(f"s{i}", label='quick_stream'))
+    assert client.timeout_for('quick_stream', 60) == GEMINI_MIN_TIMEOUT
+    pause = GEMINI_MIN_TIMEOUT + 0.5
+    assert ''.join(client.stream(f'gap:{pause}', label='quick_stream', timeout=pause + 3)) \
+        == f'streamed answer to gap:{pause} '
+    assert ''.join(client.stream(f'late:{pause}', label='quick_stream', timeout=pause + 3)) \
+        == f'streamed answer to late:{pause} '
+    assert client.breaker.status()['consecutive_failures'] == 0
+    print(f"✅ stream: {pause:g}s pause between chunks allowed, late first chunk retried with the full timeout")
+
+    # Circuit breaker: open after 3 failures, fail fast, half-open probe
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+    client = GeminiClient(api_key='test', base_url=base_url, breaker=breaker, max_retries=0)
+    state['down'] = True
+    for _ in range(3):
+        try:
+            client.generate('x', label='outage')
+        except GeminiUnavailable:
+            raise AssertionError('circuit opened too early')
+        except GeminiError as e:
+            assert e.status_code == 503
+    assert breaker.status()['state'] == CircuitBreaker.OPEN
+    sent = state['requests']
+    start = time.perf_counter()
+    for _ in range(50):
+        try:
+            client.generate('x', label='outage')
+            raise AssertionError('open circuit must fail fast')
+        except GeminiUnavailable as e:
+            assert e.retry_after <= 0.5
+    assert state['requests'] == sent, 'open circuit sent requests'
+    print(f"✅ open circuit rejected 50 calls in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    time.sleep(0.6)  # half-open: one probe, still down → open again
+    try:
+        client.generate('x', label='outage')
+    except GeminiUnavailable:
+        raise AssertionError('half-open must let a probe through')
+    except GeminiError:
+        pass
+    assert breaker.status()['state'] == CircuitBreaker.OPEN and state['requests'] == sent + 1
+
+    try:
+        next(client.stream('x', label='outage'))
+        raise AssertionError('open circuit must fail streams fast')
+    except GeminiUnavailable:
+        pass
+
+    state['down'] = False
+    time.sleep(0.6)  # half-open probe succeeds → closed
+    assert client.generate('x', label='outage') == 'echo: x'
+    assert breaker.status()['state'] == CircuitBreaker.CLOSED
+    print(f"✅ half-open probe closed the circuit: {breaker.status()}")
+
+    server.shutdown()
+    for label, entry in client.metrics().items():
+        print(f"   {label:8} {entry}")
+
+
+if __name__ == "__main__":
+    import sys
+    if '--self-test' in sys.argv:
+        _self_test()
@@ -0,0 +1,175 @@
+"""
+Jargon Explanation Cache
+Two tiers in front of the Groq explainer, keyed by the normalized term
+("HbA1c", "hba1c ", "HBA1C" → "hba1c"):
+  1. in-process: knowledge-base terms (prewarmed from
+     MedicalKnowledgeBase descriptions, never evicted; what the user typed is
+     resolved through JargonIndex - aliases, spellings, typos) + an LRU of
+     LLM answers
+  2. MongoDB `jargon_cache`, shared by all workers; entries expire after
+     JARGON_CACHE_TTL_DAYS (TTL index, see db_indexes) so answers get refreshed
+Only terms missing from both tiers reach the LLM.
+
+Benchmark:
+    python utils/jargon_cache.py --benchmark
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    from utils.medical_knowledge import get_knowledge_base
+    from utils.jargon_index import get_jargon_index, normalize_term
+except ImportError:
+    from medical_knowledge import get_knowledge_base
+    from jargon_index import get_jargon_index, normalize_term
+
+JARGON_CACHE_COLLECTION = 'jargon_cache'
+JARGON_CACHE_SIZE = int(os.getenv('JARGON_CACHE_SIZE', 2048))
+JARGON_CACHE_TTL_DAYS = int(os.getenv('JARGON_CACHE_TTL_DAYS', 90))
+
+GENDER_LABELS = {'male': 'men', 'female': 'women'}
+
+
+def knowledge_base_explanation(term, info):
+    """Explanation (same keys as the LLM answer) from a knowledge base entry"""
+    unit = info.get('unit', '')
+    ranges = {gender: f"{bounds['min']}-{bounds['max']} {unit}".strip()
+              for gender, bounds in info.get('normal_ranges', {}).items()}
+    example = f"It is checked as part of {info['category']} tests."
+    if ranges:
+        if len(set(ranges.values())) == 1:
+            typical = next(iter(ranges.values()))
+        else:
+            typical = " and ".join(f"{text} for {GENDER_LABELS.get(gender, gender)}"
+                                   for gender, text in ranges.items())
+        example = (f"It is checked as part of {info['category']} tests; a typical healthy "
+                   f"result is {typical}.")
+    return {
+        "term": term,
+        "definition": info['description'],
+        "pronunciation": "Not available",
+        "example": example
+    }
+
+
+class JargonCache:
+    """Knowledge-base entries + thread-safe LRU + optional Mongo tier"""
+
+    def __init__(self, max_entries=JARGON_CACHE_SIZE, knowledge_base=None, index=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'kb_hits': 0, 'kb_fuzzy_hits': 0, 'memory_hits': 0, 'db_hits': 0,
+                          'misses': 0, 'stores': 0}
+        self.index = index or get_jargon_index()
+        self._static = self._prewarm(knowledge_base or get_knowledge_base())
+
+    @staticmethod
+    def _prewarm(kb):
+        """knowledge base term → explanation"""
+        return {term: knowledge_base_explanation(term, info) for term, info in kb.knowledge.items()}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get(self, term, db=None):
+        """
+        Cached explanation for the term, or None (caller asks the LLM).
+        Order: knowledge base (exact/alias), LRU, knowledge base (typo), MongoDB
+        """
+        match = self.index.resolve(term, fuzzy=False)
+        if match is not None and match.term in self._static:
+            self._count('kb_hits')
+            return dict(self._static[match.term])
+
+        key = normalize_term(term)
+
+        with self._lock:
+            explanation = self._entries.get(key)
+            if explanation is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return dict(explanation, term=term.capitalize())
+
+        match = self.index.resolve(term)
+        if match is not None and match.term in self._static:
+            self._count('kb_fuzzy_hits')
+            return dict(self._static[match.term])
+
+        if db is not None:
+            try:
+                entry = db[JARGON_CACHE_COLLECTION].find_one({'_id': key}, {'explanation': 1})
+            except Exception as e:
+                print(f"⚠️ Jargon cache lookup failed: {e}")
+                entry = None
+            if entry:
+                self._count('db_hits')
+                self._remember(key, entry['explanation'])
+                return dict(entry['explanation'], term=term.capitalize())
+
+        self._count('misses')
+        return None
+
+    def put(self, term, explanation, db=None):
+        """Store an LLM explanation in memory and (if given) MongoDB"""
+        key = normalize_term(term)
+        self._remember(key, explanation)
+        self._count('stores')
+        if db is not None:
+            try:
+                db[JARGON_CACHE_COLLECTION].update_one(
+                    {'_id': key},
+                    {'$set': {'explanation': explanation, 'created_at': datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ Jargon cache update failed: {e}")
+
+    def _remember(self, key, explanation):
+        with self._lock:
+            self._entries[key] = explanation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['entries'] = len(self._entries)
+        counters['kb_terms'] = len(self._static)
+        lookups = (counters['kb_hits'] + counters['kb_fuzzy_hits'] + counters['memory_hits']
+                   + counters['db_hits'] + counters['misses'])
+        counters['hit_rate'] = round((lookups - counters['misses']) / lookups, 3) if lookups else 0.0
+        return counters
+
+
+# Shared per process
+jargon_cache = JargonCache()
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import sys
+    import timeit
+
+    if '--benchmark' in sys.argv:
+        cache = JargonCache()
+        cache.put('Erythrocyte sedimentation', {
+            "term": "Erythrocyte sedimentation", "definition": "-", "pronunciation": "-", "example": "-"
+        })
+        iterations = 20000
+        for label, term in (('knowledge base term', ' HBA1C '),
+                            ('knowledge base alias', 'Glycated Hemoglobin'),
+                            ('misspelled term', 'cholestrol'),
+                            ('cached LLM answer', 'erythrocyte  Sedimentation'),
+                            ('miss (goes to LLM)', 'Spherocytosis')):
+            seconds = timeit.timeit(lambda: cache.get(term), number=iterations)
+            print(f"{label:22} {term!r:28} {seconds / iterations * 1e6:7.2f} µs per lookup")
+        print(cache.stats())
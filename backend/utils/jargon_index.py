@@ -0,0 +1,198 @@
+"""
+Local Jargon Term Index
+Resolves what a user typed to a MedicalKnowledgeBase term without any LLM:
+  1. exact: normalized knowledge base names and every parser alias
+     (MultiFormatReportParser.test_aliases), also with spaces removed
+     ("hb a1c", "HbA1c", "glycated hemoglobin" → HbA1c)
+  2. fuzzy, for misspellings only ("cholestrol", "haemoglobn", "potasium"):
+     trigram similarity (Dice coefficient) picks candidates, which must then
+     match word by word - short words exactly, longer ones within
+     one or two typos and at most one letter longer or shorter - so
+     "vitamin k", "hemoglobinuria" or "creatine" are NOT answered as
+     Vitamin D / Hemoglobin / Creatinine but go to the LLM
+Built once per process from the shared knowledge base.
+
+Benchmark:
+    python utils/jargon_index.py --benchmark
+"""
+
+import heapq
+import os
+import re
+import sys
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from utils.medical_knowledge import get_knowledge_base
+    from utils.report_parser import MultiFormatReportParser
+except ImportError:
+    from medical_knowledge import get_knowledge_base
+    from report_parser import MultiFormatReportParser
+
+# Minimum trigram similarity for a fuzzy candidate
+JARGON_FUZZY_THRESHOLD = float(os.getenv('JARGON_FUZZY_THRESHOLD', 0.5))
+JARGON_FUZZY_MIN_LENGTH = 5
+# Candidates checked word by word per fuzzy lookup (most similar first)
+JARGON_FUZZY_CANDIDATES = 10
+# Words up to this length (e.g. "b12", "t3", "ldl") must match exactly
+JARGON_EXACT_WORD_LENGTH = 3
+# A misspelled word may drop or add at most this many letters: a longer
+# difference is usually another substance ("creatine" / "creatinine")
+JARGON_MAX_LENGTH_DIFFERENCE = 1
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+TermMatch = namedtuple('TermMatch', ['term', 'match', 'score'])
+
+
+def normalize_term(term):
+    """Lookup key: lowercase alphanumerics separated by single spaces"""
+    return _NON_ALNUM.sub(' ', term.lower()).strip()
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count 1), capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def is_typo_of(query, key):
+    """True if every word of query is the same word of key, allowing typos in long words"""
+    query_words, key_words = query.split(), key.split()
+    if len(query_words) != len(key_words):
+        return False
+    for typed, word in zip(query_words, key_words):
+        if typed == word:
+            continue
+        if len(word) <= JARGON_EXACT_WORD_LENGTH or any(ch.isdigit() for ch in typed + word):
+            return False
+        if abs(len(typed) - len(word)) > JARGON_MAX_LENGTH_DIFFERENCE:
+            return False
+        if edit_distance(typed, word, 2 if len(word) >= 8 else 1) > (2 if len(word) >= 8 else 1):
+            return False
+    return True
+
+
+class JargonIndex:
+
+    def __init__(self, knowledge_base=None, aliases=None):
+        kb = knowledge_base or get_knowledge_base()
+        if aliases is None:
+            aliases = MultiFormatReportParser.alias_to_standard
+
+        names = {term: term for term in kb.knowledge}
+        names.update((alias, standard) for alias, standard in aliases.items() if standard in kb.knowledge)
+
+        # exact key (normalized and compact spelling) → knowledge base term
+        self.exact = {}
+        for name, term in names.items():
+            key = normalize_term(name)
+            self.exact.setdefault(key, term)
+            self.exact.setdefault(key.replace(' ', ''), term)
+
+        # trigram → keys containing it
+        self.keys = list(self.exact)
+        self.key_trigram_counts = [len(trigrams(key)) for key in self.keys]
+        self.postings = {}
+        for position, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(position)
+
+    def resolve(self, term, fuzzy=True):
+        """TermMatch(term, 'exact'|'fuzzy', score) or None for an unknown term"""
+        key = normalize_term(term)
+        if not key:
+            return None
+
+        for candidate in (key, key.replace(' ', '')):
+            if candidate in self.exact:
+                return TermMatch(self.exact[candidate], 'exact', 1.0)
+
+        if not fuzzy or len(key) < JARGON_FUZZY_MIN_LENGTH:
+            return None
+        return self.fuzzy(key)
+
+    def fuzzy(self, key):
+        """Most similar key (trigrams) that the query is a misspelling of, or None"""
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+
+        candidates = []
+        for position, count in shared.items():
+            score = 2 * count / (len(grams) + self.key_trigram_counts[position])
+            if score >= JARGON_FUZZY_THRESHOLD:
+                candidates.append((score, position))
+
+        for score, position in heapq.nlargest(JARGON_FUZZY_CANDIDATES, candidates):
+            if is_typo_of(key, self.keys[position]):
+                return TermMatch(self.exact[self.keys[position]], 'fuzzy', round(score, 3))
+        return None
+
+
+_SHARED_INDEX = None
+
+
+def get_jargon_index():
+    """Process-wide JargonIndex (built on first use)"""
+    global _SHARED_INDEX
+    if _SHARED_INDEX is None:
+        _SHARED_INDEX = JargonIndex()
+    return _SHARED_INDEX
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+# Typed term → expected knowledge base term (None: must go to the LLM)
+REGRESSION_CASES = (
+    ('cholestrol', 'Total Cholesterol'),
+    ('haemoglobn', 'Hemoglobin'),
+    ('creatinin', 'Creatinine'),
+    ('platelet', 'Platelets'),
+    ('vitamin k', None),
+    ('vitamin b6', None),
+    ('hemoglobinuria', None),
+    ('creatine', None),
+)
+
+if __name__ == "__main__":
+    import timeit
+
+    if '--benchmark' in sys.argv:
+        index = get_jargon_index()
+        for term, expected in REGRESSION_CASES:
+            match = index.resolve(term)
+            assert (match.term if match else None) == expected, (term, match)
+        print(f"✅ {len(REGRESSION_CASES)} regression cases resolve as expected")
+        print(f"{len(index.exact)} exact keys, {len(index.postings)} trigrams")
+        iterations = 20000
+        for label, term in (('knowledge base name', 'Vitamin D'),
+                            ('parser alias', 'Glycated Hemoglobin'),
+                            ('compact spelling', 'HB-A1C'),
+                            ('fuzzy (misspelled)', 'cholestrol'),
+                            ('unknown term', 'spherocytosis')):
+            seconds = timeit.timeit(lambda: index.resolve(term), number=iterations)
+            print(f"{label:20} {term!r:24} → {index.resolve(term)}  {seconds / iterations * 1e6:7.2f} µs")
@@ -0,0 +1,292 @@
+"""
+Report Job Queue - MongoDB-backed background processing for uploads
+The upload endpoint enqueues a job and returns immediately; a pool of worker
+threads inside each web process claims jobs atomically and runs the report
+pipeline, recording per-stage progress. Jobs reference the upload by its
+path in UPLOAD_FOLDER, so they must run where the web process saved it.
+Every pool also sweeps for jobs orphaned by a crashed worker.
+"""
+
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+try:
+    from utils.report_pipeline import (
+        PIPELINE_STAGES,
+        ReportProcessingError,
+        process_uploaded_report,
+    )
+except ImportError:
+    from report_pipeline import (
+        PIPELINE_STAGES,
+        ReportProcessingError,
+        process_uploaded_report,
+    )
+
+JOBS_COLLECTION = 'report_jobs'
+
+# A running job whose heartbeat is older than this is assumed orphaned
+# (worker crashed / was redeployed) and is put back on the queue.
+STALE_JOB_SECONDS = int(os.getenv('REPORT_JOB_STALE_SECONDS', 600))
+MAX_JOB_ATTEMPTS = int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', 2))
+# How often each worker pool looks for such jobs
+STALE_JOB_SWEEP_SECONDS = int(os.getenv('REPORT_JOB_SWEEP_SECONDS', 60))
+
+FINISHED_STAGE_STATUSES = ('done', 'cached', 'skipped')
+
+
+def create_job(db, user_email, params):
+    """Insert a queued job and return its id as a string"""
+    now = datetime.utcnow()
+    job = {
+        'user_email': user_email,
+        'status': 'queued',
+        'params': params,
+        'stages': {stage: {'status': 'pending'} for stage in PIPELINE_STAGES},
+        'progress': 0,
+        'stages_done': 0,
+        'attempts': 0,
+        'result': None,
+        'error': None,
+        'created_at': now,
+        'updated_at': now,
+        'heartbeat_at': None,
+        'worker_id': None,
+    }
+    result = db[JOBS_COLLECTION].insert_one(job)
+    return str(result.inserted_id)
+
+
+def get_job(db, job_id, user_email):
+    """Fetch a job owned by user_email (None if missing or not a valid id)"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        object_id = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        return None
+    return db[JOBS_COLLECTION].find_one({
+        '_id': object_id,
+        'user_email': user_email
+    })
+
+
+def format_job(job):
+    """Convert a job document into the JSON shape returned by /jobs/<id>"""
+    return {
+        'job_id': str(job['_id']),
+        'status': job.get('status'),
+        'progress': job.get('progress', 0),
+        'stages': job.get('stages', {}),
+        'attempts': job.get('attempts', 0),
+        'report_id': (job.get('result') or {}).get('report_id'),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': job['created_at'].isoformat() if job.get('created_at') else None,
+        'updated_at': job['updated_at'].isoformat() if job.get('updated_at') else None,
+    }
+
+
+def claim_next_job(db, worker_id):
+    """Atomically move the oldest queued job to 'running' and return it"""
+    now = datetime.utcnow()
+    return db[JOBS_COLLECTION].find_one_and_update(
+        {'status': 'queued'},
+        {
+            '$set': {
+                'status': 'running',
+                'worker_id': worker_id,
+                'started_at': now,
+                'updated_at': now,
+                'heartbeat_at': now,
+            },
+            '$inc': {'attempts': 1}
+        },
+        sort=[('created_at', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def update_stage(db, job_id, stage, status):
+    """Record a stage transition and refresh the job heartbeat"""
+    now = datetime.utcnow()
+    update = {
+        f'stages.{stage}.status': status,
+        'updated_at': now,
+        'heartbeat_at': now,
+    }
+    if status == 'running':
+        update[f'stages.{stage}.started_at'] = now
+    else:
+        update[f'stages.{stage}.finished_at'] = now
+
+    if status not in FINISHED_STAGE_STATUSES or stage not in PIPELINE_STAGES:
+        db[JOBS_COLLECTION].update_one({'_id': job_id}, {'$set': update})
+        return
+
+    # Stages run concurrently (DAG), so progress counts finished stages rather
+    # than using the stage's position; a stage reported twice counts once
+    already_finished = {'$in': [{'$ifNull': [f'$stages.{stage}.status', None]}, list(FINISHED_STAGE_STATUSES)]}
+    db[JOBS_COLLECTION].update_one({'_id': job_id}, [
+        {'$set': {'stages_done': {'$add': [
+            {'$ifNull': ['$stages_done', 0]},
+            {'$cond': [already_finished, 0, 1]}
+        ]}}},
+        {'$set': {
+            **update,
+            'progress': {'$max': [
+                {'$ifNull': ['$progress', 0]},
+                {'$toInt': {'$floor': {'$divide': [{'$multiply': ['$stages_done', 100]}, len(PIPELINE_STAGES)]}}}
+            ]}
+        }},
+    ])
+
+
+def complete_job(db, job_id, result):
+    now = datetime.utcnow()
+    db[JOBS_COLLECTION].update_one({'_id': job_id}, {'$set': {
+        'status': 'completed',
+        'progress': 100,
+        'result': result,
+        'finished_at': now,
+        'updated_at': now,
+    }})
+
+
+def fail_job(db, job_id, error, status_code=500):
+    now = datetime.utcnow()
+    db[JOBS_COLLECTION].update_one({'_id': job_id}, {'$set': {
+        'status': 'failed',
+        'error': error,
+        'error_status_code': status_code,
+        'finished_at': now,
+        'updated_at': now,
+    }})
+
+
+def requeue_stale_jobs(db, stale_after=STALE_JOB_SECONDS):
+    """Put orphaned running jobs back on the queue (or fail them after MAX_JOB_ATTEMPTS)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stale = {'status': 'running', 'heartbeat_at': {'$lt': cutoff}}
+
+    db[JOBS_COLLECTION].update_many(
+        {**stale, 'attempts': {'$gte': MAX_JOB_ATTEMPTS}},
+        {'$set': {
+            'status': 'failed',
+            'error': {'error': 'Report processing was interrupted too many times'},
+            'updated_at': datetime.utcnow(),
+        }}
+    )
+    result = db[JOBS_COLLECTION].update_many(
+        {**stale, 'attempts': {'$lt': MAX_JOB_ATTEMPTS}},
+        {'$set': {'status': 'queued', 'worker_id': None, 'updated_at': datetime.utcnow()}}
+    )
+    return result.modified_count
+
+
+class ReportWorkerPool:
+    """
+    Fixed-size pool of threads that drain the report job queue, started
+    inside each web process (REPORT_INPROCESS_WORKERS). While polling, the
+    pool re-queues stale jobs every sweep_interval seconds, so a job
+    orphaned by a crashed worker does not wait for a restart.
+    """
+
+    def __init__(self, db, num_workers=2, poll_interval=1.0, sweep_interval=STALE_JOB_SWEEP_SECONDS):
+        self.db = db
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._id_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def start(self):
+        if self._threads:
+            return self
+
+        self.sweep_stale_jobs()
+        for index in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(f"{self._id_prefix}:{index}",),
+                name=f"report-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        print(f"✅ Report worker pool started ({self.num_workers} workers)")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def sweep_stale_jobs(self):
+        """requeue_stale_jobs, at most once per sweep_interval for the whole pool"""
+        with self._sweep_lock:
+            now = time.monotonic()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        try:
+            requeued = requeue_stale_jobs(self.db)
+            if requeued:
+                print(f"🔄 Re-queued {requeued} stale report job(s)")
+        except Exception as e:
+            print(f"⚠️ Stale job recovery failed: {e}")
+
+    def _worker_loop(self, worker_id):
+        while not self._stop.is_set():
+            self.sweep_stale_jobs()
+            try:
+                job = claim_next_job(self.db, worker_id)
+            except Exception as e:
+                print(f"⚠️ [{worker_id}] Failed to poll job queue: {e}")
+                job = None
+
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.run_job(job)
+
+    def run_job(self, job):
+        job_id = job['_id']
+        params = job['params']
+        print(f"\n🛠️ Processing report job {job_id} ({params.get('filename')})")
+
+        try:
+            result = process_uploaded_report(
+                self.db,
+                job['user_email'],
+                params['filepath'],
+                params['filename'],
+                params['unique_filename'],
+                params['file_size'],
+                verify_report=params.get('verify_report', False),
+                use_ai=params.get('use_ai', False),
+                on_stage=lambda stage, status: update_stage(self.db, job_id, stage, status),
+                file_hash=params.get('file_hash'),
+                expected_panels=params.get('expected_panels')
+            )
+            complete_job(self.db, job_id, result)
+            print(f"✅ Report job {job_id} completed")
+        except ReportProcessingError as e:
+            print(f"❌ Report job {job_id} failed: {e}")
+            fail_job(self.db, job_id, e.payload, e.status_code)
+        except Exception as e:
+            print(f"❌ Report job {job_id} crashed: {e}")
+            traceback.print_exc()
+            fail_job(self.db, job_id, {'error': str(e)}, 500)
@@ -2,18 +2,48 @@
 Enhanced Medical Knowledge Base
 100+ medical terms with comprehensive information
 Age/gender-specific ranges, disease interpretations, recommendations
+
+The knowledge literal is built ONCE per process into frozen, indexed
+structures (see bottom of module); every MedicalKnowledgeBase instance
+shares them, so constructing one per request costs nothing.
+
+interpret_many() classifies many values at once against array-packed
+min/max tables (vectorized with NumPy when it is installed) and returns
+compact status codes; full interpretation dicts are built only on access.
 """
 
+from array import array
+from collections import Counter, namedtuple
+from types import MappingProxyType
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Compact per-gender range record; normal_range is the preformatted display string
+RangeRecord = namedtuple('RangeRecord', ['min', 'max', 'unit', 'normal_range'])
+
+
 class MedicalKnowledgeBase:
     
     def __init__(self):
-        """Initialize comprehensive medical knowledge base"""
+        """Bind the shared, precompiled knowledge base (no per-instance copy)"""
+        self.knowledge = KNOWLEDGE
+        self.range_index = RANGE_INDEX
+        self.category_index = CATEGORY_INDEX
+    
+    @staticmethod
+    def _build_knowledge():
+        """Build the raw knowledge base literal - only called once at import"""
         
         # ============================================
         # COMPLETE BLOOD COUNT (CBC) - 15 terms
         # ============================================
         
-        self.knowledge = {
+        return {
             'Hemoglobin': {
                 'category': 'Complete Blood Count (CBC)',
                 'unit': 'g/dL',
@@ -1449,62 +1479,67 @@ class MedicalKnowledgeBase:
     
     def get_normal_range(self, term, gender='female', age=50):
         """Get normal range for a specific term"""
-        if term not in self.knowledge:
+        record = self.range_index.get(term, {}).get(gender)
+        if record is None:
             return None
         
-        info = self.knowledge[term]
-        
-        if 'normal_ranges' in info:
-            # Return gender-specific range
-            if gender in info['normal_ranges']:
-                return {
-                    'min': info['normal_ranges'][gender]['min'],
-                    'max': info['normal_ranges'][gender]['max'],
-                    'unit': info['unit']
-                }
-        
-        return None
+        return {
+            'min': record.min,
+            'max': record.max,
+            'unit': record.unit
+        }
     
     def get_interpretation(self, term, value, gender='female', age=50):
         """Get interpretation for a test value"""
         if term not in self.knowledge:
+            return self.expand_interpretation(term, STATUS_UNKNOWN_TERM, gender)
+        
+        normal_range = self.range_index[term].get(gender)
+        
+        # Determine status
+        if normal_range is None:
+            code = STATUS_NO_RANGE
+        elif value < normal_range.min:
+            code = STATUS_LOW
+        elif value > normal_range.max:
+            code = STATUS_HIGH
+        else:
+            code = STATUS_NORMAL
+        return self.expand_interpretation(term, code, gender)
+    
+    def expand_interpretation(self, term, code, gender='female'):
+        """Full interpretation dict for a status code (see interpret_many)"""
+        if code == STATUS_UNKNOWN_TERM:
             return {
                 'status': 'unknown',
                 'message': f'No information available for {term}'
             }
-        
-        info = self.knowledge[term]
-        normal_range = self.get_normal_range(term, gender, age)
-        
-        if not normal_range:
+        if code == STATUS_NO_RANGE:
             return {
                 'status': 'unknown',
                 'message': 'Normal range not available'
             }
         
-        # Determine status
-        if value < normal_range['min']:
-            status = 'low'
-            condition_info = info['low']
-        elif value > normal_range['max']:
-            status = 'high'
-            condition_info = info['high']
-        else:
-            status = 'normal'
+        info = self.knowledge[term]
+        normal_range = self.range_index[term][gender]
+        
+        if code == STATUS_NORMAL:
             return {
                 'status': 'normal',
                 'message': f'{term} is within the healthy range',
-                'normal_range': f"{normal_range['min']}-{normal_range['max']} {normal_range['unit']}",
+                'normal_range': normal_range.normal_range,
                 'category': info['category'],
                 'description': info['description']
             }
         
         # Build detailed interpretation
+        status = STATUS_NAMES[code]
+        condition_info = info[status]
         return {
             'status': status,
             'category': info['category'],
             'description': info['description'],
-            'normal_range': f"{normal_range['min']}-{normal_range['max']} {normal_range['unit']}",
+            'normal_range': normal_range.normal_range,
             'condition': condition_info['condition'],
             'causes': condition_info['causes'],
             'symptoms': condition_info['symptoms'],
@@ -1512,31 +1547,271 @@ class MedicalKnowledgeBase:
             'action': condition_info['action']
         }
     
+    def interpret_many(self, terms, values, gender='female', age=50):
+        """
+        Classify a whole report - or the results of many reports of one
+        gender, concatenated - in one pass over the packed range tables.
+        Returns an InterpretationBatch: status codes (array('b')), expanded
+        to get_interpretation()-equal dicts only for the items accessed.
+        Raises ValueError if terms and values differ in length.
+        """
+        terms = list(terms)
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        if len(terms) != len(values):
+            raise ValueError(f"interpret_many: {len(terms)} terms but {len(values)} values")
+        column = GENDER_COLUMNS.get(gender)
+        rows = [TERM_ROWS.get(term, -1) for term in terms]
+        
+        if NUMPY_AVAILABLE:
+            codes = _classify_numpy(rows, values, column)
+        else:
+            codes = _classify_array(rows, values, column)
+        return InterpretationBatch(self, terms, gender, codes)
+    
     def get_all_terms(self):
         """Get list of all available terms"""
         return list(self.knowledge.keys())
     
     def get_terms_by_category(self, category):
         """Get all terms in a specific category"""
-        return [
-            term for term, info in self.knowledge.items()
-            if info['category'] == category
-        ]
+        return list(self.category_index.get(category, ()))
     
     def get_all_categories(self):
         """Get list of all categories"""
-        categories = set()
-        for info in self.knowledge.values():
-            categories.add(info['category'])
-        return sorted(list(categories))
+        return list(ALL_CATEGORIES)
+
+
+class InterpretationBatch:
+    """Result of interpret_many(): one status code per item, dicts built lazily"""
+    
+    __slots__ = ('kb', 'terms', 'gender', 'codes')
+    
+    def __init__(self, kb, terms, gender, codes):
+        self.kb = kb
+        self.terms = terms
+        self.gender = gender
+        self.codes = codes
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def __getitem__(self, index):
+        return self.kb.expand_interpretation(self.terms[index], self.codes[index], self.gender)
+    
+    def __iter__(self):
+        for index in range(len(self.codes)):
+            yield self[index]
+    
+    def status(self, index):
+        return STATUS_NAMES[self.codes[index]]
+    
+    def abnormal(self):
+        """Indices of low / high results"""
+        return [index for index, code in enumerate(self.codes) if code >= STATUS_LOW]
+    
+    def counts(self):
+        """status name → number of items"""
+        counts = Counter()
+        for code, count in Counter(self.codes).items():
+            counts[STATUS_NAMES[code]] += count
+        return dict(counts)
+
+
+# ============================================
+# PROCESS-WIDE PRECOMPILED KNOWLEDGE
+# ============================================
+
+def _freeze(obj):
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(obj, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    return obj
+
+
+def _build_range_index(knowledge):
+    """term → {gender: RangeRecord}"""
+    index = {}
+    for term, info in knowledge.items():
+        records = {}
+        unit = info.get('unit')
+        for gender, bounds in info.get('normal_ranges', {}).items():
+            records[gender] = RangeRecord(
+                bounds['min'],
+                bounds['max'],
+                unit,
+                f"{bounds['min']}-{bounds['max']} {unit}"
+            )
+        index[term] = MappingProxyType(records)
+    return MappingProxyType(index)
+
+
+def _build_category_index(knowledge):
+    """category → tuple of terms (in knowledge base order)"""
+    index = {}
+    for term, info in knowledge.items():
+        index.setdefault(info['category'], []).append(term)
+    return MappingProxyType({category: tuple(terms) for category, terms in index.items()})
+
+
+def _build_range_tables(range_index):
+    """
+    term → row, gender → column, and row-major min/max tables
+    (array('d'), NaN where a term has no range for a gender)
+    """
+    terms = tuple(range_index)
+    genders = tuple(sorted({gender for records in range_index.values() for gender in records}))
+    range_min = array('d', [float('nan')]) * (len(terms) * len(genders))
+    range_max = array('d', range_min)
+    for row, term in enumerate(terms):
+        for column, gender in enumerate(genders):
+            record = range_index[term].get(gender)
+            if record is not None:
+                range_min[row * len(genders) + column] = record.min
+                range_max[row * len(genders) + column] = record.max
+    return (
+        MappingProxyType({term: row for row, term in enumerate(terms)}),
+        MappingProxyType({gender: column for column, gender in enumerate(genders)}),
+        range_min,
+        range_max
+    )
+
+
+def _classify_array(rows, values, column):
+    """Status codes, one pass over the stdlib arrays"""
+    codes = array('b', bytes(len(rows)))
+    width = len(GENDER_COLUMNS)
+    for index, (row, value) in enumerate(zip(rows, values)):
+        if row < 0:
+            continue  # STATUS_UNKNOWN_TERM
+        if column is None:
+            codes[index] = STATUS_NO_RANGE
+            continue
+        low = RANGE_MIN[row * width + column]
+        if low != low:
+            codes[index] = STATUS_NO_RANGE
+        elif value < low:
+            codes[index] = STATUS_LOW
+        elif value > RANGE_MAX[row * width + column]:
+            codes[index] = STATUS_HIGH
+        else:
+            codes[index] = STATUS_NORMAL
+    return codes
+
+
+def _classify_numpy(rows, values, column):
+    """Status codes, vectorized over NumPy views of the same tables"""
+    rows = np.asarray(rows, dtype=np.intp)
+    values = np.asarray(values, dtype=np.float64)
+    known = rows >= 0
+    if column is None:
+        codes = np.where(known, STATUS_NO_RANGE, STATUS_UNKNOWN_TERM)
+    else:
+        slots = np.where(known, rows * len(GENDER_COLUMNS) + column, 0)
+        low, high = RANGE_MIN_NP[slots], RANGE_MAX_NP[slots]
+        codes = np.select(
+            [~known, np.isnan(low), values < low, values > high],
+            [STATUS_UNKNOWN_TERM, STATUS_NO_RANGE, STATUS_LOW, STATUS_HIGH],
+            STATUS_NORMAL
+        )
+    packed = array('b')
+    packed.frombytes(codes.astype(np.int8).tobytes())
+    return packed
+
+
+# Compact status codes (interpret_many)
+STATUS_UNKNOWN_TERM = 0   # term not in the knowledge base
+STATUS_NO_RANGE = 1       # no normal range for this gender
+STATUS_NORMAL = 2
+STATUS_LOW = 3
+STATUS_HIGH = 4
+STATUS_NAMES = ('unknown', 'unknown', 'normal', 'low', 'high')
+
+KNOWLEDGE = _freeze(MedicalKnowledgeBase._build_knowledge())
+RANGE_INDEX = _build_range_index(KNOWLEDGE)
+CATEGORY_INDEX = _build_category_index(KNOWLEDGE)
+ALL_CATEGORIES = tuple(sorted(CATEGORY_INDEX))
+TERM_ROWS, GENDER_COLUMNS, RANGE_MIN, RANGE_MAX = _build_range_tables(RANGE_INDEX)
+if NUMPY_AVAILABLE:
+    RANGE_MIN_NP = np.frombuffer(RANGE_MIN, dtype=np.float64)
+    RANGE_MAX_NP = np.frombuffer(RANGE_MAX, dtype=np.float64)
+
+_SHARED_KB = MedicalKnowledgeBase()
+
+
+def get_knowledge_base():
+    """Return the process-wide shared MedicalKnowledgeBase"""
+    return _SHARED_KB
 
 
 # ============================================
 # TESTING
 # ============================================
 
+def _benchmark(iterations=2000):
+    """Compare the old per-request construction cost with the shared instance"""
+    import timeit
+    
+    rebuild = timeit.timeit(MedicalKnowledgeBase._build_knowledge, number=iterations)
+    construct = timeit.timeit(MedicalKnowledgeBase, number=iterations)
+    shared = timeit.timeit(get_knowledge_base, number=iterations)
+    
+    print(f"Per-request construction cost ({iterations} iterations):")
+    print(f"  Rebuild knowledge literal (old __init__): {rebuild / iterations * 1e6:8.2f} µs")
+    print(f"  MedicalKnowledgeBase() (shared data):      {construct / iterations * 1e6:8.2f} µs")
+    print(f"  get_knowledge_base():                      {shared / iterations * 1e6:8.2f} µs")
+    
+    _benchmark_batch()
+
+
+def _benchmark_batch(reports=1000, tests=100, seed=3):
+    """get_interpretation per value vs one interpret_many pass (reprocessing job)"""
+    import random
+    import time
+    
+    kb = get_knowledge_base()
+    rng = random.Random(seed)
+    known = kb.get_all_terms()
+    terms, values = [], []
+    for _ in range(reports * tests):
+        term = rng.choice(known) if rng.random() < 0.95 else 'Unlisted Test'
+        bounds = kb.get_normal_range(term, 'male') or {'min': 1, 'max': 10}
+        terms.append(term)
+        values.append(round(rng.uniform(0, bounds['max'] * 1.5), 2))
+    
+    start = time.perf_counter()
+    singles = [kb.get_interpretation(term, value, 'male', 50) for term, value in zip(terms, values)]
+    per_value = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batch = kb.interpret_many(terms, values, 'male', 50)
+    classify = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    abnormal = [batch[index] for index in batch.abnormal()]
+    expand = time.perf_counter() - start
+    
+    assert list(batch) == singles
+    assert [batch.status(i) for i in range(len(batch))] == [item['status'] for item in singles]
+    
+    backend = 'numpy' if NUMPY_AVAILABLE else 'array'
+    print(f"\nBatch interpretation ({reports} reports x {tests} tests = {len(terms)} values, {backend}):")
+    print(f"  get_interpretation per value:             {per_value * 1000:8.1f} ms")
+    print(f"  interpret_many (status codes):            {classify * 1000:8.1f} ms")
+    print(f"  + expand {len(abnormal)} abnormal results:        {expand * 1000:8.1f} ms")
+    print(f"  {batch.counts()}")
+
+
 if __name__ == "__main__":
-    kb = MedicalKnowledgeBase()
+    import sys
+    
+    if '--benchmark' in sys.argv:
+        _benchmark()
+        sys.exit(0)
+    
+    kb = get_knowledge_base()
     
     print(f"Total terms in knowledge base: {len(kb.get_all_terms())}")
     print(f"\nCategories:")
@@ -0,0 +1,87 @@
+"""
+One-off data migrations
+
+    python -m utils.migrations uploaded-at [--dry-run] [--uri ...]   (from backend/)
+
+uploaded-at: reports used to store uploaded_at as an IST display string
+("2026-10-17 03:45 PM"), which sorts wrongly and can't be range-queried.
+Converts every such report to a native UTC datetime. Unparseable or missing
+values fall back to the ObjectId creation time. Safe to re-run.
+"""
+
+from pymongo import UpdateOne
+
+try:
+    from utils.report_pipeline import parse_legacy_uploaded_at
+except ImportError:
+    from report_pipeline import parse_legacy_uploaded_at
+
+MIGRATION_BATCH_SIZE = 500
+
+
+def migrate_uploaded_at(db, dry_run=False, batch_size=MIGRATION_BATCH_SIZE):
+    """Convert string/missing reports.uploaded_at to datetimes; returns counters"""
+    reports_collection = db['reports']
+    stats = {'scanned': 0, 'converted': 0, 'fallback_to_id': 0}
+    batch = []
+
+    cursor = reports_collection.find(
+        {'uploaded_at': {'$not': {'$type': 'date'}}},
+        {'uploaded_at': 1}
+    )
+    for report in cursor:
+        stats['scanned'] += 1
+        uploaded_at = parse_legacy_uploaded_at(report.get('uploaded_at'))
+        if uploaded_at is None:
+            uploaded_at = report['_id'].generation_time.replace(tzinfo=None)
+            stats['fallback_to_id'] += 1
+        else:
+            stats['converted'] += 1
+
+        batch.append(UpdateOne(
+            {'_id': report['_id']},
+            {
+                '$set': {'uploaded_at': uploaded_at},
+                # Display string is now derived at response time
+                '$unset': {'history_summary.uploaded_at': ''}
+            }
+        ))
+        if len(batch) >= batch_size:
+            if not dry_run:
+                reports_collection.bulk_write(batch, ordered=False)
+            batch = []
+
+    if batch and not dry_run:
+        reports_collection.bulk_write(batch, ordered=False)
+
+    return stats
+
+
+MIGRATIONS = {
+    'uploaded-at': migrate_uploaded_at,
+}
+
+
+# ============================================
+# CLI
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Run a one-off data migration')
+    parser.add_argument('migration', choices=sorted(MIGRATIONS))
+    parser.add_argument('--uri', default=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/medical_report_db'))
+    parser.add_argument('--dry-run', action='store_true', help='count affected documents without writing')
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri).get_database()
+    stats = MIGRATIONS[args.migration](db, dry_run=args.dry_run)
+
+    prefix = '🔍 [dry run]' if args.dry_run else '✅'
+    print(f"{prefix} {args.migration}: " + ', '.join(f"{key}={value}" for key, value in stats.items()))
@@ -1,40 +1,207 @@
 import PyPDF2
 import os
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-def process_file(filepath):
+try:
+    from utils.pdf_document import PDFDocument
+except ImportError:
+    from pdf_document import PDFDocument
+
+# Page-parallel extraction for long documents (lab bundles)
+PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 12))
+PDF_EXTRACT_PROCESSES = int(os.getenv('PDF_EXTRACT_PROCESSES', min(4, os.cpu_count() or 1)))
+# Contiguous pages per worker task - small enough that early stop saves work
+PAGES_PER_TASK = 4
+# Pages with less extracted text than this (non-whitespace chars) that embed
+# an image are treated as scanned and OCR'd on their own
+LOW_TEXT_PAGE_CHARS = int(os.getenv('PDF_LOW_TEXT_PAGE_CHARS', 50))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Process pool shared by all requests in this worker (created on first use)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # forkserver/spawn: never fork a multi-threaded web worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES, mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _extract_page_shard(filepath, indices):
+    """Worker: memory-map the PDF and extract text of the given pages"""
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PyPDF2.PdfReader(mapped)
+        return [(index, reader.pages[index].extract_text() or '') for index in indices]
+
+
+def _iter_pages_parallel(filepath, page_count):
+    """(index, text) in page order; shards run ahead on the process pool"""
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_page_shard, filepath, list(range(start, min(start + PAGES_PER_TASK, page_count))))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            for index, text in future.result():
+                yield index, text
+    finally:
+        # Early stop / error: drop shards that have not started yet
+        for future in futures:
+            future.cancel()
+
+
+def iter_page_texts(filepath, document=None, parallel=None, stop_when=None):
+    """
+    Generator of extracted PDF page text, in page order, each page as soon
+    as it is ready (feed it to MultiFormatReportParser.parse_pages).
+    Empty pages and the document's leading whitespace are skipped, so
+    '\n'.join(pages).strip() is exactly process_file()'s text.
+    parallel / stop_when: as in process_file. PyPDF2 errors are raised.
+    """
+    if document is None:
+        document = PDFDocument(filepath)
+    page_count = document.page_count
+
+    if parallel is None:
+        parallel = page_count >= PARALLEL_MIN_PAGES and PDF_EXTRACT_PROCESSES > 1
+
+    if parallel:
+        print(f" Page-parallel extraction: {page_count} pages on {PDF_EXTRACT_PROCESSES} processes")
+        pages = _iter_pages_parallel(filepath, page_count)
+    else:
+        pages = enumerate(document.iter_page_text())
+
+    started = False
+    try:
+        for index, text in pages:
+            if parallel:
+                document.remember_page_text(index, text)
+            page = text if started else text.lstrip()
+            if page:
+                started = True
+                yield page
+            if stop_when is not None and stop_when(text) and index < page_count - 1:
+                print(f" Early stop after page {index + 1}/{page_count} - expected panels found")
+                break
+    finally:
+        if parallel:
+            pages.close()
+
+
+def find_low_text_pages(document):
+    """
+    Indices of extracted pages that look scanned: fewer than
+    LOW_TEXT_PAGE_CHARS characters of text and at least one embedded image
+    (blank pages and short cover pages have no image and are left alone).
+    Uses the page text memoized during extraction; pages skipped by an
+    early stop are ignored.
+    """
+    low_text = []
+    for index in range(document.page_count):
+        text = document.cached_page_text(index)
+        if text is None:
+            continue
+        if len(''.join(text.split())) < LOW_TEXT_PAGE_CHARS and document.page_has_images(index):
+            low_text.append(index)
+    return low_text
+
+
+def merge_page_texts(document, ocr_texts):
+    """
+    Document text in page order, with each OCR'd run of pages
+    ({(first, last): text}) replacing those pages' PyPDF2 text
+    """
+    runs = {first: (last, text) for (first, last), text in ocr_texts.items()}
+    page_texts = []
+    index = 0
+    while index < document.page_count:
+        if index in runs:
+            last, text = runs[index]
+            page_texts.append(text)
+            index = last + 1
+        else:
+            page_texts.append(document.page_text(index))
+            index += 1
+    return '\n'.join(text for text in page_texts if text).strip()
+
+
+def process_file(filepath, document=None, parallel=None, stop_when=None, low_text_pages=None):
     """
     Fast PDF text extraction using PyPDF2
     Works for digital PDFs (not scanned images)
+    Pass a PDFDocument to reuse an already-parsed file.
+    parallel: extract pages on a process pool (default: PDFs with
+              PARALLEL_MIN_PAGES+ pages)
+    stop_when: callable(page_text) -> True to stop after the current page
+               (e.g. report_parser.PanelTracker)
+    low_text_pages: list to fill with the indices of scanned-looking pages
+                    (see find_low_text_pages)
     Returns extracted text or None
     """
     try:
         if filepath.lower().endswith('.pdf'):
             print(f" Extracting text from PDF: {filepath}")
-            
-            with open(filepath, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                extracted_text = ""
-                
-                # Extract text from all pages
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text:
-                        extracted_text += text + "\n"
-                
-                extracted_text = extracted_text.strip()
-                
-                if extracted_text:
-                    print(f" PyPDF2 extracted {len(extracted_text)} characters")
-                    return extracted_text
-                else:
-                    print(" PyPDF2 extracted no text (might be scanned image)")
-                    return None
-        
+
+            if document is None:
+                document = PDFDocument(filepath)
+
+            # Extract text from all pages (joined once)
+            pages = iter_page_texts(filepath, document=document, parallel=parallel, stop_when=stop_when)
+            extracted_text = '\n'.join(pages).strip()
+
+            if low_text_pages is not None:
+                low_text_pages.extend(find_low_text_pages(document))
+                if low_text_pages:
+                    print(f" {len(low_text_pages)}/{document.page_count} page(s) look scanned (low text density)")
+
+            if extracted_text:
+                print(f" PyPDF2 extracted {len(extracted_text)} characters")
+                return extracted_text
+            else:
+                print(" PyPDF2 extracted no text (might be scanned image)")
+                return None
+
         else:
             # For images, return None (let AI handle it)
             print(f"Not a PDF file: {filepath}")
             return None
-            
+
     except Exception as e:
         print(f"PyPDF2 extraction failed: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+# ============================================
+# BENCHMARK: serial vs page-parallel
+# ============================================
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import time
+
+    if '--benchmark' in sys.argv:
+        from pdf_document import _sample_pdf_bytes
+
+        for pages in (24, 96):
+            fd, path = tempfile.mkstemp(suffix='.pdf')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_sample_pdf_bytes(pages))
+            process_file(path, parallel=True)  # warm up the pool
+            for parallel in (False, True):
+                start = time.perf_counter()
+                text = process_file(path, parallel=parallel)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{pages:3} pages  {'parallel' if parallel else 'serial  '}  {elapsed:8.1f} ms  ({len(text)} chars)")
+            os.remove(path)
@@ -0,0 +1,96 @@
+"""
+Persistent OCR Result Cache
+Gemini OCR output stored on disk, one file per (file hash, prompt version).
+Shared by every process on the host; bounded by total size with LRU eviction
+(file mtime is bumped on every hit). Hit/miss counters are per process.
+"""
+
+import hashlib
+import os
+import threading
+
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', os.path.join(os.getcwd(), 'ocr_cache'))
+OCR_CACHE_MAX_MB = float(os.getenv('OCR_CACHE_MAX_MB', 200))
+
+
+class OCRCache:
+
+    def __init__(self, directory=OCR_CACHE_DIR, max_bytes=int(OCR_CACHE_MAX_MB * 1024 * 1024)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def file_hash(data):
+        """SHA-256 of the raw document bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, file_hash, prompt_version):
+        return os.path.join(self.directory, f"{file_hash}_{prompt_version}.txt")
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get(self, file_hash, prompt_version):
+        """Cached OCR text, or None"""
+        path = self._path(file_hash, prompt_version)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)  # LRU: mark as recently used
+        except OSError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return text
+
+    def put(self, file_hash, prompt_version, text):
+        """Store OCR text (atomic rename), then evict down to max_bytes"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(file_hash, prompt_version)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+            self._count('stores')
+            self._evict()
+        except OSError as e:
+            print(f"⚠️ OCR cache write failed: {e}")
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.txt'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()  # oldest (least recently used) first
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass  # removed concurrently by another process
+        if evicted:
+            self._count('evictions', evicted)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 3) if lookups else 0.0
+        return counters
+
+
+# Shared per process
+ocr_cache = OCRCache()
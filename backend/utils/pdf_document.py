@@ -0,0 +1,265 @@
+"""
+Shared Parsed PDF Document
+Reads the file once and builds ONE PyPDF2 reader that text extraction
+(ocr.process_file), forensics (PDFForensics) and verify-authenticity share.
+The file is parsed on first use and the structure forensics reads (page
+list, encryption flag, metadata, xref info) is snapshotted right then, so
+forensics never waits on text extraction. Page content reads (text, images,
+page subsets) still go through the one reader stream and share a lock;
+page text is memoized per page.
+
+Benchmark:
+    python utils/pdf_document.py --benchmark
+"""
+
+import io
+import threading
+
+import PyPDF2
+
+
+class PDFDocument:
+
+    def __init__(self, filepath, data=None):
+        self.filepath = filepath
+        if data is None:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+        self.data = data
+        # _parse_lock: lazy parse; _read_lock: page content reads on the reader stream
+        self._parse_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._reader = None
+        self._pages = None
+        self._is_encrypted = None
+        self._metadata = None
+        self._metadata_error = None
+        self._xref_objects = 0
+        self._page_text = {}
+
+    @classmethod
+    def open(cls, filepath):
+        """PDFDocument for a .pdf path, None for anything else (images)"""
+        if not filepath.lower().endswith('.pdf'):
+            return None
+        return cls(filepath)
+
+    @property
+    def reader(self):
+        self._parse()
+        return self._reader
+
+    def _parse(self):
+        """Build the reader once and snapshot the structure forensics reads"""
+        if self._reader is not None:
+            return
+        with self._parse_lock:
+            if self._reader is not None:
+                return
+            reader = PyPDF2.PdfReader(io.BytesIO(self.data))
+            self._pages = list(reader.pages)
+            self._is_encrypted = reader.is_encrypted
+            try:
+                info = reader.metadata
+                self._metadata = {key: info[key] for key in info} if info else None
+            except Exception as e:
+                self._metadata_error = e
+            self._xref_objects = sum(len(entries) for entries in getattr(reader, 'xref', {}).values())
+            self._reader = reader
+
+    @property
+    def size_bytes(self):
+        return len(self.data)
+
+    # ============================================
+    # STRUCTURE (used by forensics)
+    # ============================================
+
+    @property
+    def pages(self):
+        self._parse()
+        return self._pages
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    @property
+    def is_encrypted(self):
+        self._parse()
+        return self._is_encrypted
+
+    @property
+    def metadata(self):
+        """Document info as a plain dict snapshot (None if the PDF has none)"""
+        self._parse()
+        if self._metadata_error is not None:
+            raise self._metadata_error
+        return self._metadata
+
+    @property
+    def xref_info(self):
+        """Cross-reference summary: object count and incremental-update sections"""
+        self._parse()
+        return {
+            'objects': self._xref_objects,
+            'eof_markers': self.data.count(b'%%EOF'),
+            'incremental_updates': max(0, self.data.count(b'%%EOF') - 1),
+        }
+
+    # ============================================
+    # TEXT
+    # ============================================
+
+    def page_text(self, index):
+        """Extracted text of one page (memoized)"""
+        text = self._page_text.get(index)
+        if text is None:
+            pages = self.pages
+            with self._read_lock:
+                if index not in self._page_text:
+                    self._page_text[index] = pages[index].extract_text() or ''
+                text = self._page_text[index]
+        return text
+
+    def remember_page_text(self, index, text):
+        """Store page text extracted elsewhere (e.g. by a worker process)"""
+        self._page_text[index] = text
+
+    def cached_page_text(self, index):
+        """Page text if it has been extracted already, else None"""
+        return self._page_text.get(index)
+
+    def iter_page_text(self):
+        for index in range(self.page_count):
+            yield self.page_text(index)
+
+    def text(self):
+        """All page text joined by newlines (empty pages skipped)"""
+        return '\n'.join(text for text in self.iter_page_text() if text).strip()
+
+    # ============================================
+    # SCANNED PAGES (page-selective OCR)
+    # ============================================
+
+    def page_has_images(self, index):
+        """True if the page draws an image XObject (a scanned page does)"""
+        pages = self.pages
+        with self._read_lock:
+            resources = pages[index].get('/Resources')
+            if resources is None:
+                return False
+            xobjects = resources.get_object().get('/XObject')
+            if xobjects is None:
+                return False
+            xobjects = xobjects.get_object()
+            return any(xobjects[name].get_object().get('/Subtype') == '/Image' for name in xobjects)
+
+    def pages_pdf(self, indices):
+        """A smaller PDF (bytes) holding only the given pages, in order"""
+        pages = self.pages
+        with self._read_lock:
+            writer = PyPDF2.PdfWriter()
+            for index in indices:
+                writer.add_page(pages[index])
+            out = io.BytesIO()
+            writer.write(out)
+            return out.getvalue()
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def _sample_pdf_bytes(pages=24):
+    """Minimal multi-page text PDF (Helvetica, lab-report-like lines)"""
+    rows = [
+        ('HEMOGLOBIN', '13.5', 'g/dL'), ('TOTAL CHOLESTEROL', '210', 'mg/dL'),
+        ('HDL CHOLESTEROL', '45', 'mg/dL'), ('TRIGLYCERIDES', '180', 'mg/dL'),
+        ('TSH', '3.2', 'uIU/mL'), ('VITAMIN D', '18', 'ng/mL'),
+        ('CREATININE', '1.1', 'mg/dL'), ('HBA1C', '6.1', '%'),
+    ]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Producer (MedLens Benchmark) /Creator (MedLens) /CreationDate (D:20260101000000) >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"BT /F1 11 Tf 50 780 Td (Page {page + 1}) Tj ET"]
+        for row, (name, value, unit) in enumerate(rows * 3):
+            lines.append(f"BT /F1 10 Tf 50 {750 - row * 28} Td ({name}    {value}    {unit}) Tj ET")
+        stream = '\n'.join(lines).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b' '.join(b"%d 0 R" % pid for pid in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref_at = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, xref_at))
+    return out.getvalue()
+
+
+def _benchmark(pages=24, repeats=5):
+    import os
+    import sys
+    import tempfile
+    import time
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.ocr import process_file
+    from utils.pdf_forensics import PDFForensics
+
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(_sample_pdf_bytes(pages))
+
+    def separate():
+        # Before: every consumer opens and parses the file itself
+        PDFForensics().analyze_pdf(path)
+        process_file(path)
+        PDFForensics().analyze_pdf(path)   # verify-authenticity re-check
+        process_file(path)
+
+    def shared():
+        document = PDFDocument(path)
+        PDFForensics().analyze_pdf(path, document=document)
+        process_file(path, document=document)
+        PDFForensics().analyze_pdf(path, document=document)
+        process_file(path, document=document)
+
+    import contextlib
+    results = {}
+    for label, func in (('separate readers', separate), ('shared document', shared)):
+        best = float('inf')
+        for _ in range(repeats):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                func()
+                best = min(best, time.perf_counter() - start)
+        results[label] = best
+        print(f"{label:18} {best * 1000:8.1f} ms  ({pages} pages, best of {repeats})")
+    os.remove(path)
+    print(f"speedup: {results['separate readers'] / results['shared document']:.1f}x")
+
+
+if __name__ == "__main__":
+    import sys
+    if '--benchmark' in sys.argv:
+        _benchmark()
@@ -4,11 +4,15 @@ Analyzes PDF metadata, structure, and digital signatures
 NO AI REQUIRED - Pure forensics algorithms
 """
 
-import PyPDF2
 from datetime import datetime
 import re
 import os
 
+try:
+    from utils.pdf_document import PDFDocument
+except ImportError:
+    from pdf_document import PDFDocument
+
 class PDFForensics:
     
     def __init__(self):
@@ -16,10 +20,11 @@ class PDFForensics:
         self.findings = []
         self.risk_level = "Unknown"
     
-    def analyze_pdf(self, filepath):
+    def analyze_pdf(self, filepath, document=None):
         """
         Comprehensive PDF forensics analysis
         Returns trust score and detailed findings
+        Pass a PDFDocument to reuse an already-parsed file.
         """
         
         print(f"\n{'='*60}")
@@ -36,35 +41,35 @@ class PDFForensics:
             }
         
         try:
-            with open(filepath, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                
-                # Run all forensic checks
-                self._check_metadata(pdf_reader)
-                self._check_encryption(pdf_reader)
-                self._check_page_count(pdf_reader)
-                self._check_creation_modification_dates(pdf_reader)
-                self._check_producer_software(pdf_reader)
-                
-                # Calculate final scores
-                trust_score = max(0, 100 - self.suspicion_score)
-                self._determine_risk_level(trust_score)
-                
-                print(f"\n{'='*60}")
-                print(f"📊 FORENSICS SUMMARY:")
-                print(f"   Trust Score: {trust_score}/100")
-                print(f"   Risk Level: {self.risk_level}")
-                print(f"   Suspicion Points: {self.suspicion_score}")
-                print(f"   Findings: {len(self.findings)}")
-                print(f"{'='*60}\n")
-                
-                return {
-                    'verified': trust_score >= 70,
-                    'trust_score': trust_score,
-                    'risk_level': self.risk_level,
-                    'findings': self.findings,
-                    'recommendations': self._generate_recommendations()
-                }
+            # PDFDocument exposes metadata / is_encrypted / pages like a PdfReader
+            pdf_reader = document if document is not None else PDFDocument(filepath)
+            
+            # Run all forensic checks
+            self._check_metadata(pdf_reader)
+            self._check_encryption(pdf_reader)
+            self._check_page_count(pdf_reader)
+            self._check_creation_modification_dates(pdf_reader)
+            self._check_producer_software(pdf_reader)
+            
+            # Calculate final scores
+            trust_score = max(0, 100 - self.suspicion_score)
+            self._determine_risk_level(trust_score)
+            
+            print(f"\n{'='*60}")
+            print(f"📊 FORENSICS SUMMARY:")
+            print(f"   Trust Score: {trust_score}/100")
+            print(f"   Risk Level: {self.risk_level}")
+            print(f"   Suspicion Points: {self.suspicion_score}")
+            print(f"   Findings: {len(self.findings)}")
+            print(f"{'='*60}\n")
+            
+            return {
+                'verified': trust_score >= 70,
+                'trust_score': trust_score,
+                'risk_level': self.risk_level,
+                'findings': self.findings,
+                'recommendations': self._generate_recommendations()
+            }
                 
         except Exception as e:
             print(f"❌ PDF Forensics Error: {e}")
@@ -0,0 +1,109 @@
+"""
+Content-Addressed Report Cache
+Uploads are hashed (SHA-256) while they stream to disk. Expensive pipeline
+stage results - text extraction, parsing + rule-based summary, PDF forensics,
+AI enhancement / fallback - are stored per file hash + CACHE_VERSION, so a
+re-uploaded document skips every stage that has already been computed once.
+CACHE_VERSION is PARSER_VERSION plus a fingerprint of the modules that
+compute those results, so a deploy that changes any of them starts a fresh
+cache without anyone remembering to bump the version.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+
+try:
+    from utils.report_parser import PARSER_VERSION
+except ImportError:
+    from report_parser import PARSER_VERSION
+
+REPORT_CACHE_COLLECTION = 'report_cache'
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Entries not used for this long are removed by a TTL index (see db_indexes)
+REPORT_CACHE_TTL_DAYS = int(os.getenv('REPORT_CACHE_TTL_DAYS', 30))
+
+# Stage results that may be stored in a cache entry
+CACHEABLE_STAGES = ('extraction', 'parsing', 'verification', 'ai_enhancement', 'ai_fallback')
+
+# Modules (in utils/) whose code produces the cached stage results
+CACHE_SOURCE_FILES = (
+    'ocr.py', 'pdf_document.py', 'pdf_forensics.py', 'report_parser.py',
+    'medical_knowledge.py', 'template_summarizer.py', 'ai_summarizer.py', 'report_pipeline.py',
+)
+
+
+def source_fingerprint(filenames=CACHE_SOURCE_FILES):
+    """Short SHA-256 over the given utils/ source files"""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in filenames:
+        digest.update(name.encode())
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+CACHE_VERSION = f"{PARSER_VERSION}-{source_fingerprint()}"
+
+
+def save_and_hash(file_storage, filepath):
+    """Stream an uploaded file to disk, returning its SHA-256 hex digest"""
+    digest = hashlib.sha256()
+    file_storage.stream.seek(0)
+    with open(filepath, 'wb') as out:
+        while True:
+            chunk = file_storage.stream.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(filepath):
+    """SHA-256 of a file already on disk"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(file_hash):
+    return f"{file_hash}:{CACHE_VERSION}"
+
+
+def load_cached_stages(db, file_hash):
+    """Return {stage: result} cached for this file (empty dict on miss/error)"""
+    try:
+        entry = db[REPORT_CACHE_COLLECTION].find_one(
+            {'_id': cache_key(file_hash)},
+            {stage: 1 for stage in CACHEABLE_STAGES}
+        )
+    except Exception as e:
+        print(f"⚠️ Report cache lookup failed: {e}")
+        return {}
+    if not entry:
+        return {}
+    return {stage: entry[stage] for stage in CACHEABLE_STAGES if stage in entry}
+
+
+def store_cached_stages(db, file_hash, new_stages, hit=False):
+    """Add newly computed stage results to the entry and refresh its TTL"""
+    now = datetime.utcnow()
+    update = {
+        '$set': {**new_stages, 'last_used_at': now},
+        '$setOnInsert': {
+            'file_hash': file_hash,
+            'parser_version': CACHE_VERSION,
+            'created_at': now,
+        },
+    }
+    if hit:
+        update['$inc'] = {'hits': 1}
+    try:
+        db[REPORT_CACHE_COLLECTION].update_one({'_id': cache_key(file_hash)}, update, upsert=True)
+    except Exception as e:
+        print(f"⚠️ Report cache update failed: {e}")
@@ -0,0 +1,94 @@
+"""
+Stage Graph - run a small DAG of pipeline stages on a thread pool
+Each stage starts as soon as all of its dependencies have finished, so
+independent stages (e.g. PDF forensics and text extraction) overlap.
+Records per-stage wall times and the critical path through the graph.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StageGraph:
+
+    def __init__(self, max_workers=3):
+        self.max_workers = max_workers
+        self.stages = {}      # name -> (func, deps), in insertion order
+        self.results = {}
+        self.timings = {}     # name -> {'start_ms', 'end_ms', 'duration_ms'}
+
+    def add(self, name, func, deps=()):
+        """Register func(results) to run after every stage in deps"""
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (func, tuple(deps))
+        return self
+
+    def run(self):
+        """
+        Execute all stages; returns {name: result}.
+        The first stage exception is re-raised once running stages finish
+        (stages that have not started yet are never run).
+        """
+        origin = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+        error = None
+
+        def timed(name, func):
+            start = time.perf_counter()
+            try:
+                return func(self.results)
+            finally:
+                end = time.perf_counter()
+                self.timings[name] = {
+                    'start_ms': round((start - origin) * 1000, 1),
+                    'end_ms': round((end - origin) * 1000, 1),
+                    'duration_ms': round((end - start) * 1000, 1),
+                }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            while pending or running:
+                if error is None:
+                    for name, (func, deps) in list(pending.items()):
+                        if all(dep in self.results for dep in deps):
+                            running[pool.submit(timed, name, func)] = name
+                            del pending[name]
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            raise error
+        return self.results
+
+    def critical_path(self):
+        """Stages on the longest dependency chain ending at the last-finishing stage"""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda stage: self.timings[stage]['end_ms'])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.stages[name][1] if dep in self.timings]
+            if not deps:
+                break
+            name = max(deps, key=lambda stage: self.timings[stage]['end_ms'])
+            path.append(name)
+        return list(reversed(path))
+
+    def report(self):
+        """Timing summary included in pipeline responses"""
+        return {
+            'stage_timings': {name: self.timings[name] for name in self.stages if name in self.timings},
+            'critical_path': self.critical_path(),
+            'total_ms': max((t['end_ms'] for t in self.timings.values()), default=0.0),
+        }
@@ -6,20 +6,165 @@ NO AI REQUIRED - Pure template logic
 
 import sys
 import os
+from functools import lru_cache
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from medical_knowledge import MedicalKnowledgeBase
+    from medical_knowledge import get_knowledge_base
 except ImportError:
-    from utils.medical_knowledge import MedicalKnowledgeBase
+    from utils.medical_knowledge import get_knowledge_base
+
+# Interpretations for results parsed without one (e.g. hand-built reports)
+INTERPRETATION_MEMO_SIZE = 4096
+
+
+@lru_cache(maxsize=INTERPRETATION_MEMO_SIZE)
+def _memo_interpretation(term, value, gender, age):
+    """Knowledge base interpretation, memoized per (term, value, gender, age)"""
+    return get_knowledge_base().get_interpretation(term, value, gender, age)
+
+
+def result_interpretation(result, gender, age):
+    """
+    The interpretation MultiFormatReportParser already attached to the
+    result (computed for the same patient_info), else a memoized lookup
+    """
+    interpretation = result.get('interpretation')
+    if interpretation is None:
+        interpretation = _memo_interpretation(result['term'], result['value'], gender, age)
+    return interpretation
+
+
+# ============================================
+# PRECOMPILED TEMPLATES (built once at import)
+# ============================================
+
+INTRODUCTION = """Looking at a medical report can feel overwhelming with all the technical terms and numbers. Don't worry - I'm here to help you understand what everything means in plain, simple language.
+
+Let's go through your test results together, step by step."""
+
+# report_type → overview description
+REPORT_TYPE_DESCRIPTIONS = {
+    'Lipid Profile': 'These tests measure the fats (lipids) in your blood, including cholesterol and triglycerides. These values help assess your risk for heart disease and stroke.',
+    'Complete Blood Count (CBC)': 'These tests measure different components of your blood, including red blood cells, white blood cells, and platelets. They help detect anemia, infections, and blood disorders.',
+    'Thyroid Function Test': 'These tests measure thyroid hormone levels to assess how well your thyroid gland is working. The thyroid controls your metabolism.',
+    'Liver Function Test': 'These tests check how well your liver is working. The liver filters toxins, makes proteins, and helps with digestion.',
+    'Kidney Function Test': 'These tests evaluate how well your kidneys are filtering waste from your blood.',
+    'Diabetes Screening / Lipid Profile': 'These tests check your blood sugar levels and cholesterol to assess diabetes risk and heart health.',
+    'Metabolic Panel': 'These tests measure various substances in your blood to evaluate overall metabolism and organ function.',
+}
+DEFAULT_REPORT_DESCRIPTION = 'This medical report contains various laboratory tests to assess your health.'
+
+OVERVIEW_TEMPLATE = """## What is this report?
+
+This is a **{report_type}** from a medical laboratory. {description}
+
+**Total tests performed:** {total_tests}"""
+
+# Knowledge base category → "What this tests" intro
+CATEGORY_INTROS = {
+    'Metabolic Panel': "**What this tests:** Your blood sugar and kidney function. This helps detect diabetes and metabolic disorders.",
+    'Complete Blood Count (CBC)': "**What this tests:** Your blood cell counts. This helps detect anemia, infections, and blood disorders.",
+    'Lipid Profile': "**What this tests:** Your cholesterol and fat levels. These affect your heart health and risk of cardiovascular disease.",
+    'Liver Function': "**What this tests:** How well your liver is working. The liver filters toxins, makes proteins, and helps with digestion.",
+    'Kidney Function': "**What this tests:** How well your kidneys are filtering waste from your blood.",
+    'Thyroid Function': "**What this tests:** Thyroid hormone levels that control your metabolism.",
+    'Cardiac Markers': "**What this tests:** Markers that indicate heart damage or stress. Useful for detecting heart attacks and heart disease.",
+    'Vitamins & Minerals': "**What this tests:** Essential nutrients needed for various body functions.",
+    'Electrolytes': "**What this tests:** Minerals that regulate fluid balance and nerve/muscle function.",
+    'Hormones': "**What this tests:** Hormone levels that regulate various body processes.",
+}
+# Rendered category headings (heading + intro)
+CATEGORY_HEADINGS = {
+    category: f"\n### {category}\n\n{intro}" for category, intro in CATEGORY_INTROS.items()
+}
+
+# status → (emoji, status text) for the "Your result" line
+STATUS_MARKERS = {
+    'normal': ("✅", "**(Normal)**"),
+    'high': ("⚠️", "**(Higher than normal)**"),
+    'low': ("⚠️", "**(Lower than normal)**"),
+}
+UNKNOWN_STATUS_MARKER = ("❓", "")
+RESULT_LINE_TEMPLATE = "\n{emoji} **Your result:** {value} {unit} {status_text}"
+
+NORMAL_MEANING = "\nYour {term} level is within the healthy range. This is excellent! It suggests this aspect of your health is functioning well."
+
+NEXT_STEPS_URGENT = "\n🚨 **URGENT:** Contact your doctor today about critical values."
+NEXT_STEPS_ACTIONS = "\n".join([
+    "\n1. **Schedule a doctor's appointment** to discuss these results in detail.",
+    "\n2. **Bring this report** to your appointment so your doctor can review it.",
+    "\n3. **Ask your doctor about:**",
+    "   • What's causing these abnormal values",
+    "   • Whether you need additional tests",
+    "   • Lifestyle changes that can help",
+    "   • Whether medication is needed",
+    "\n4. **Maintain healthy habits:**",
+    "   • Eat a balanced diet rich in fruits and vegetables",
+    "   • Exercise regularly (at least 30 minutes daily)",
+    "   • Get adequate sleep (7-8 hours)",
+    "   • Manage stress through relaxation techniques",
+    "   • Stay hydrated",
+])
+NEXT_STEPS_RETEST = "\n5. **Plan for retesting** in 3-6 months to track your progress."
+NEXT_STEPS_REMINDER = "\n**Remember:** This summary is for educational purposes. Your doctor will interpret these results in the context of your overall health, symptoms, and medical history to provide personalized care."
+
+# Rendered per-test fragments, keyed by the term, status and every
+# interpretation field they render: everything in a test section except
+# the "Your result" line
+FRAGMENT_MEMO_SIZE = 4096
+FRAGMENT_FIELDS = ('normal_range', 'description', 'condition', 'action')
+FRAGMENT_LIST_FIELDS = ('causes', 'symptoms')
+_MISSING = object()
+_fragments = {}
+
+
+def _test_fragments(term, interpretation):
+    """(text before, text after) the result line of a test section, memoized"""
+    status = interpretation.get('status', 'unknown')
+    key = (term, status,
+           *(interpretation.get(field, _MISSING) for field in FRAGMENT_FIELDS),
+           *(tuple(interpretation.get(field) or ())[:3] for field in FRAGMENT_LIST_FIELDS))
+    fragments = _fragments.get(key)
+    if fragments is not None:
+        return fragments
+    
+    lines = []
+    if 'normal_range' in interpretation:
+        lines.append(f"\n**Normal range:** {interpretation['normal_range']}")
+    if 'description' in interpretation:
+        lines.append(f"\n**What is {term}?**\n\n{interpretation['description']}")
+    
+    lines.append("\n**What this means for you:**\n")
+    if status != 'normal':
+        # Interpretation for abnormal values
+        if 'condition' in interpretation:
+            lines.append(f"\nYour {term} level indicates: **{interpretation['condition']}**.")
+        if interpretation.get('causes'):
+            causes_text = "\n".join([f"• {cause}" for cause in interpretation['causes'][:3]])
+            lines.append(f"\n**Common reasons for this:**\n{causes_text}")
+        if interpretation.get('symptoms'):
+            symptoms_text = "\n".join([f"• {symptom}" for symptom in interpretation['symptoms'][:3]])
+            lines.append(f"\n**Symptoms that might occur:**\n{symptoms_text}")
+        if 'action' in interpretation:
+            lines.append(f"\n**Recommended action:** {interpretation['action']}")
+    else:
+        lines.append(NORMAL_MEANING.format(term=term))
+    lines.append("\n---\n")
+    
+    fragments = (f"\n#### {term}\n", "\n" + "\n".join(lines))
+    if len(_fragments) >= FRAGMENT_MEMO_SIZE:
+        _fragments.clear()
+    _fragments[key] = fragments
+    return fragments
 
 
 class TemplateSummarizer:
     
     def __init__(self):
-        self.kb = MedicalKnowledgeBase()
+        self.kb = get_knowledge_base()  # shared process-wide instance
     
     def generate_summary(self, parsed_report):
         """
@@ -47,37 +192,19 @@ class TemplateSummarizer:
     
     def _generate_introduction(self):
         """Generate friendly introduction"""
-        return """Looking at a medical report can feel overwhelming with all the technical terms and numbers. Don't worry - I'm here to help you understand what everything means in plain, simple language.
-
-Let's go through your test results together, step by step."""
+        return INTRODUCTION
     
     def _generate_overview(self, parsed_report):
         """Generate report overview"""
         report_type = parsed_report.get('report_type', 'Medical Report')
-        total_tests = parsed_report.get('total_tests', 0)
-        
-        # Get category description
-        category_descriptions = {
-            'Lipid Profile': 'These tests measure the fats (lipids) in your blood, including cholesterol and triglycerides. These values help assess your risk for heart disease and stroke.',
-            'Complete Blood Count (CBC)': 'These tests measure different components of your blood, including red blood cells, white blood cells, and platelets. They help detect anemia, infections, and blood disorders.',
-            'Thyroid Function Test': 'These tests measure thyroid hormone levels to assess how well your thyroid gland is working. The thyroid controls your metabolism.',
-            'Liver Function Test': 'These tests check how well your liver is working. The liver filters toxins, makes proteins, and helps with digestion.',
-            'Kidney Function Test': 'These tests evaluate how well your kidneys are filtering waste from your blood.',
-            'Diabetes Screening / Lipid Profile': 'These tests check your blood sugar levels and cholesterol to assess diabetes risk and heart health.',
-            'Metabolic Panel': 'These tests measure various substances in your blood to evaluate overall metabolism and organ function.',
-        }
-        
-        description = category_descriptions.get(report_type, 'This medical report contains various laboratory tests to assess your health.')
-        
-        return f"""## What is this report?
-
-This is a **{report_type}** from a medical laboratory. {description}
-
-**Total tests performed:** {total_tests}"""
+        return OVERVIEW_TEMPLATE.format(
+            report_type=report_type,
+            description=REPORT_TYPE_DESCRIPTIONS.get(report_type, DEFAULT_REPORT_DESCRIPTION),
+            total_tests=parsed_report.get('total_tests', 0)
+        )
     
     def _generate_detailed_test_explanations(self, parsed_report):
         """Generate detailed explanation for each test result"""
-        categorized = parsed_report.get('categorized', {})
         all_results = parsed_report.get('all_results', [])
         gender = parsed_report.get('patient_info', {}).get('gender', 'female')
         age = parsed_report.get('patient_info', {}).get('age', 50)
@@ -85,106 +212,29 @@ This is a **{report_type}** from a medical laboratory. {description}
         # Group tests by category
         tests_by_category = {}
         for result in all_results:
-            term = result['term']
-            
-            # ✅ FIX: Use get_interpretation instead of get_term_info
-            interpretation = self.kb.get_interpretation(term, result['value'], gender, age)
+            # Parser output already carries the interpretation - no second lookup
+            interpretation = result_interpretation(result, gender, age)
             
             if interpretation and 'category' in interpretation:
-                category = interpretation['category']
-                if category not in tests_by_category:
-                    tests_by_category[category] = []
-                tests_by_category[category].append((result, interpretation))
+                tests_by_category.setdefault(interpretation['category'], []).append((result, interpretation))
         
         # Generate output
         output = ["## Let's look at your results:"]
-        
-        # Category descriptions
-        category_intros = {
-            'Metabolic Panel': "**What this tests:** Your blood sugar and kidney function. This helps detect diabetes and metabolic disorders.",
-            'Complete Blood Count (CBC)': "**What this tests:** Your blood cell counts. This helps detect anemia, infections, and blood disorders.",
-            'Lipid Profile': "**What this tests:** Your cholesterol and fat levels. These affect your heart health and risk of cardiovascular disease.",
-            'Liver Function': "**What this tests:** How well your liver is working. The liver filters toxins, makes proteins, and helps with digestion.",
-            'Kidney Function': "**What this tests:** How well your kidneys are filtering waste from your blood.",
-            'Thyroid Function': "**What this tests:** Thyroid hormone levels that control your metabolism.",
-            'Cardiac Markers': "**What this tests:** Markers that indicate heart damage or stress. Useful for detecting heart attacks and heart disease.",
-            'Vitamins & Minerals': "**What this tests:** Essential nutrients needed for various body functions.",
-            'Electrolytes': "**What this tests:** Minerals that regulate fluid balance and nerve/muscle function.",
-            'Hormones': "**What this tests:** Hormone levels that regulate various body processes.",
-        }
-        
         for category, tests in sorted(tests_by_category.items()):
-            output.append(f"\n### {category}")
-            
-            # Add category intro if available
-            if category in category_intros:
-                output.append(f"\n{category_intros[category]}")
-            
+            output.append(CATEGORY_HEADINGS.get(category) or f"\n### {category}")
             for result, interpretation in tests:
                 output.append(self._format_test_result(result, interpretation, gender, age))
         
         return "\n".join(output)
     
     def _format_test_result(self, result, interpretation, gender, age):
-        """Format a single test result with interpretation"""
+        """Format a single test result: memoized fragments around the result line"""
         term = result['term']
-        value = result['value']
-        unit = result.get('unit', '')
-        status = interpretation.get('status', 'unknown')
-        
-        # Status emoji
-        if status == 'normal':
-            emoji = "✅"
-            status_text = "**(Normal)**"
-        elif status == 'high':
-            emoji = "⚠️"
-            status_text = "**(Higher than normal)**"
-        elif status == 'low':
-            emoji = "⚠️"
-            status_text = "**(Lower than normal)**"
-        else:
-            emoji = "❓"
-            status_text = ""
-        
-        # Build output
-        lines = [
-            f"\n#### {term}",
-            f"\n{emoji} **Your result:** {value} {unit} {status_text}",
-        ]
-        
-        # Add normal range
-        if 'normal_range' in interpretation:
-            lines.append(f"\n**Normal range:** {interpretation['normal_range']}")
-        
-        # Add description
-        if 'description' in interpretation:
-            lines.append(f"\n**What is {term}?**\n\n{interpretation['description']}")
-        
-        # Add interpretation for abnormal values
-        if status != 'normal':
-            lines.append(f"\n**What this means for you:**\n")
-            
-            if 'condition' in interpretation:
-                lines.append(f"\nYour {term} level indicates: **{interpretation['condition']}**.")
-            
-            if 'causes' in interpretation and interpretation['causes']:
-                causes_text = "\n".join([f"• {cause}" for cause in interpretation['causes'][:3]])
-                lines.append(f"\n**Common reasons for this:**\n{causes_text}")
-            
-            if 'symptoms' in interpretation and interpretation['symptoms']:
-                symptoms_text = "\n".join([f"• {symptom}" for symptom in interpretation['symptoms'][:3]])
-                lines.append(f"\n**Symptoms that might occur:**\n{symptoms_text}")
-            
-            if 'action' in interpretation:
-                lines.append(f"\n**Recommended action:** {interpretation['action']}")
-        else:
-            # Normal value
-            lines.append(f"\n**What this means for you:**\n")
-            lines.append(f"\nYour {term} level is within the healthy range. This is excellent! It suggests this aspect of your health is functioning well.")
-        
-        lines.append("\n---\n")
-        
-        return "\n".join(lines)
+        before, after = _test_fragments(term, interpretation)
+        emoji, status_text = STATUS_MARKERS.get(interpretation.get('status', 'unknown'), UNKNOWN_STATUS_MARKER)
+        return before + RESULT_LINE_TEMPLATE.format(
+            emoji=emoji, value=result['value'], unit=result.get('unit', ''), status_text=status_text
+        ) + after
     
     def _generate_overall_summary(self, parsed_report):
         """Generate overall health summary"""
@@ -263,39 +313,97 @@ This is a **{report_type}** from a medical laboratory. {description}
         abnormal_count = len(categorized.get('high', [])) + len(categorized.get('low', []))
         
         output = ["## What to do next:"]
-        
         if critical_count > 0:
-            output.append("\n🚨 **URGENT:** Contact your doctor today about critical values.")
-        
-        output.append("\n1. **Schedule a doctor's appointment** to discuss these results in detail.")
-        output.append("\n2. **Bring this report** to your appointment so your doctor can review it.")
-        
-        output.append("\n3. **Ask your doctor about:**")
-        output.append("   • What's causing these abnormal values")
-        output.append("   • Whether you need additional tests")
-        output.append("   • Lifestyle changes that can help")
-        output.append("   • Whether medication is needed")
-        
-        output.append("\n4. **Maintain healthy habits:**")
-        output.append("   • Eat a balanced diet rich in fruits and vegetables")
-        output.append("   • Exercise regularly (at least 30 minutes daily)")
-        output.append("   • Get adequate sleep (7-8 hours)")
-        output.append("   • Manage stress through relaxation techniques")
-        output.append("   • Stay hydrated")
-        
+            output.append(NEXT_STEPS_URGENT)
+        output.append(NEXT_STEPS_ACTIONS)
         if abnormal_count > 0:
-            output.append("\n5. **Plan for retesting** in 3-6 months to track your progress.")
-        
-        output.append("\n**Remember:** This summary is for educational purposes. Your doctor will interpret these results in the context of your overall health, symptoms, and medical history to provide personalized care.")
+            output.append(NEXT_STEPS_RETEST)
+        output.append(NEXT_STEPS_REMINDER)
         
         return "\n".join(output)
 
 
+# ============================================
+# BENCHMARK
+# ============================================
+
+def _benchmark_panel(tests=100, seed=7):
+    """Parser-shaped report with `tests` results (values spread over low/normal/high)"""
+    import random
+    
+    rng = random.Random(seed)
+    kb = get_knowledge_base()
+    terms = [term for term in kb.get_all_terms() if kb.get_normal_range(term, 'female')]
+    results = []
+    for i in range(tests):
+        term = terms[i % len(terms)]
+        bounds = kb.get_normal_range(term, 'female')
+        value = round(rng.uniform(bounds['min'] * 0.5, bounds['max'] * 1.5 + 1), 1)
+        results.append({
+            'term': term, 'value': value, 'unit': bounds['unit'],
+            'interpretation': kb.get_interpretation(term, value, 'female', 50)
+        })
+    categorized = {'normal': [], 'high': [], 'low': [], 'critical': []}
+    for result in results:
+        categorized.setdefault(result['interpretation']['status'], []).append(result)
+    return {
+        'report_type': 'Metabolic Panel',
+        'total_tests': len(results),
+        'all_results': results,
+        'categorized': categorized,
+        'patient_info': {'gender': 'female', 'age': 50}
+    }
+
+
+def _benchmark(tests=100, repeats=200):
+    import timeit
+    
+    report = _benchmark_panel(tests)
+    summarizer = TemplateSummarizer()
+    kb = get_knowledge_base()
+    
+    # Before: every result re-interpreted (and every section rendered) on every call
+    def reinterpret():
+        _memo_interpretation.cache_clear()
+        _fragments.clear()
+        return summarizer.generate_summary(before_report)
+    before_report = dict(report, all_results=[
+        {key: value for key, value in result.items() if key != 'interpretation'}
+        for result in report['all_results']
+    ])
+    
+    calls = {'count': 0}
+    original = kb.get_interpretation
+    def counting(*args, **kwargs):
+        calls['count'] += 1
+        return original(*args, **kwargs)
+    
+    kb.get_interpretation = counting
+    try:
+        assert reinterpret() == summarizer.generate_summary(report)
+        def cold_fragments():
+            _fragments.clear()
+            return summarizer.generate_summary(report)
+        for label, func in (('re-interpret per result', reinterpret),
+                            ('rendering every section', cold_fragments),
+                            ('memoized fragments', lambda: summarizer.generate_summary(report))):
+            calls['count'] = 0
+            seconds = timeit.timeit(func, number=repeats)
+            print(f"{label:24} {seconds / repeats * 1000:7.3f} ms per summary  "
+                  f"({calls['count'] / repeats:.0f} get_interpretation calls, {tests} tests)")
+    finally:
+        del kb.get_interpretation
+
+
 # ============================================
 # TESTING
 # ============================================
 
 if __name__ == "__main__":
+    if '--benchmark' in sys.argv:
+        _benchmark()
+        sys.exit(0)
+    
     # Test data
     test_data = {
         'report_type': 'Lipid Profile',
@@ -9,6 +9,8 @@ function ChatSection({ reportId, isOpen, onClose }) {
   const [suggestions, setSuggestions] = useState([]);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
+  // Server-side chat session (the backend keeps the conversation)
+  const sessionIdRef = useRef(null);
 
   // Fetch suggestions when component opens
   useEffect(() => {
@@ -23,6 +25,7 @@ function ChatSection({ reportId, isOpen, onClose }) {
 
     if (isOpen && reportId) {
       fetchSuggestions();
+      sessionIdRef.current = null;
       // Add welcome message
       setMessages([{
         role: 'assistant',
@@ -56,31 +59,55 @@ function ChatSection({ reportId, isOpen, onClose }) {
     setInput('');
     setLoading(true);
 
+    // Streamed answer: added on the first token, then grows in place
+    const streamId = `stream-${Date.now()}`;
+    const upsertStreamed = (changes) => setMessages(prev =>
+      prev.some(msg => msg.streamId === streamId)
+        ? prev.map(msg => (msg.streamId === streamId ? { ...msg, ...changes } : msg))
+        : [...prev, { role: 'assistant', timestamp: new Date().toISOString(), streamId, ...changes }]
+    );
+    let content = '';
+
     try {
       // Send to backend
-      const response = await reportAPI.chatWithReport(reportId, {
+      const result = await reportAPI.streamChatWithReport(reportId, {
         question: userQuestion,
-        history: messages
+        session_id: sessionIdRef.current
+      }, (text) => {
+        content += text;
+        setLoading(false);
+        upsertStreamed({ content });
+      }, (start) => {
+        sessionIdRef.current = start.session_id;
       });
 
-      // Add AI response
-      const aiMessage = {
-        role: 'assistant',
-        content: response.data.answer,
-        timestamp: response.data.timestamp
-      };
-      
-      setMessages(prev => [...prev, aiMessage]);
+      upsertStreamed({ content: result.answer, timestamp: result.timestamp });
     } catch (error) {
       console.error('Chat error:', error);
-      
+
+      if (!content && !error.fromStream) {
+        // Stream could not be opened (e.g. a buffering proxy) - use the regular endpoint
+        try {
+          const response = await reportAPI.chatWithReport(reportId, {
+            question: userQuestion,
+            session_id: sessionIdRef.current
+          });
+          sessionIdRef.current = response.data.session_id;
+          upsertStreamed({ content: response.data.answer, timestamp: response.data.timestamp });
+          return;
+        } catch (fallbackError) {
+          console.error('Chat fallback error:', fallbackError);
+        }
+      }
+
       // Add error message
-      setMessages(prev => [...prev, {
-        role: 'assistant',
-        content: 'Sorry, I encountered an error. Please try again.',
+      upsertStreamed({
+        content: error.data?.retry_after_seconds
+          ? 'The AI assistant is temporarily unavailable. Please try again in a minute.'
+          : 'Sorry, I encountered an error. Please try again.',
         timestamp: new Date().toISOString(),
         isError: true
-      }]);
+      });
     } finally {
       setLoading(false);
       inputRef.current?.focus();
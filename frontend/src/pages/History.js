@@ -7,6 +7,8 @@ function History({ darkMode, setDarkMode }) {
   const [reports, setReports] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextBefore, setNextBefore] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
   const username = localStorage.getItem('username');
 
@@ -21,6 +23,7 @@ function History({ darkMode, setDarkMode }) {
     try {
       const res = await reportAPI.getHistory();
       setReports(res.data.reports || []);
+      setNextBefore(res.data.has_more ? res.data.next_before : null);
     } catch (err) {
       const errorMessage = getApiErrorMessage(err);
       setError(errorMessage);
@@ -30,6 +33,24 @@ function History({ darkMode, setDarkMode }) {
     }
   };
 
+  // The server returns one page at a time; next_before is the cursor for the next one
+  const loadMore = async () => {
+    if (!nextBefore || loadingMore) return;
+    setLoadingMore(true);
+
+    try {
+      const res = await reportAPI.getHistory({ before: nextBefore });
+      setReports(prev => [...prev, ...(res.data.reports || [])]);
+      setNextBefore(res.data.has_more ? res.data.next_before : null);
+    } catch (err) {
+      const errorMessage = getApiErrorMessage(err);
+      setError(errorMessage);
+      console.error('Failed to load more history:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateStr) => {
     const date = new Date(dateStr);
     const today = new Date();
@@ -42,7 +63,7 @@ function History({ darkMode, setDarkMode }) {
   };
 
   const grouped = reports.reduce((acc, r) => {
-    const { label } = formatDate(r.uploaded_at);
+    const { label } = formatDate(r.uploaded_at_iso || r.uploaded_at);
     if (!acc[label]) acc[label] = [];
     acc[label].push(r);
     return acc;
@@ -192,7 +213,7 @@ function History({ darkMode, setDarkMode }) {
                             <svg width="16" height="16" viewBox="0 0 20 20" fill="currentColor">
                               <path fillRule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zm1-12a1 1 0 10-2 0v4a1 1 0 00.293.707l2.828 2.829a1 1 0 101.415-1.415L11 9.586V6z" clipRule="evenodd"/>
                             </svg>
-                            {formatDate(r.uploaded_at).time}
+                            {formatDate(r.uploaded_at_iso || r.uploaded_at).time}
                           </span>
                         </div>
                         
@@ -216,6 +237,14 @@ function History({ darkMode, setDarkMode }) {
                 </div>
               </div>
             ))}
+
+            {nextBefore && (
+              <div className="history-load-more">
+                <button onClick={loadMore} className="btn-secondary" disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load More Reports'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
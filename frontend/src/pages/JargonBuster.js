@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { jargonAPI } from '../utils/api';
 import '../App.css';
@@ -9,6 +9,8 @@ function JargonBuster({ darkMode, setDarkMode }) {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [recentSearches, setRecentSearches] = useState([]);
+  // Popular terms, explained up front in one batch request
+  const [prefetched, setPrefetched] = useState({});
   const navigate = useNavigate();
   const username = localStorage.getItem('username');
 
@@ -24,6 +26,19 @@ function JargonBuster({ darkMode, setDarkMode }) {
     { term: 'Creatinine', icon: '🫘', category: 'Kidney' },
   ];
 
+  useEffect(() => {
+    jargonAPI.explainBatch(popularTerms.map(item => item.term))
+      .then(res => {
+        const byTerm = {};
+        res.data.results.forEach(item => {
+          if (!item.error) byTerm[item.query] = item;
+        });
+        setPrefetched(byTerm);
+      })
+      .catch(err => console.error('Jargon prefetch error:', err));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   const explainTerm = async (termToExplain = null) => {
     const searchTerm = termToExplain || search.trim();
     
@@ -37,7 +52,9 @@ function JargonBuster({ darkMode, setDarkMode }) {
     setResult(null);
 
     try {
-      const res = await jargonAPI.explain(searchTerm);
+      const res = prefetched[searchTerm]
+        ? { data: prefetched[searchTerm] }
+        : await jargonAPI.explain(searchTerm);
       setResult(res.data);
       
       // Add to recent searches (limit to 5)
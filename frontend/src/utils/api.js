@@ -151,6 +151,68 @@ api.interceptors.response.use(
   }
 );
 
+// POST that answers with an SSE stream (axios can't read streamed bodies in
+// the browser). handlers: { eventName: (payload) => ... }; resolves with the
+// 'done' payload, rejects on an 'error' event or a non-2xx response.
+const streamSSE = async (url, data, handlers = {}) => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_BASE_URL}${url}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(data),
+  });
+
+  if (!response.ok || !response.body) {
+    const error = new Error(`Stream request failed (${response.status})`);
+    error.status = response.status;
+    try {
+      error.data = await response.json();
+    } catch (e) {
+      error.data = {};
+    }
+    throw error;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Frames are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let payload = '';
+      frame.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) payload += line.slice(5).trim();
+      });
+      const parsed = payload ? JSON.parse(payload) : {};
+
+      if (event === 'error') {
+        const error = new Error(parsed.error || 'Stream failed');
+        error.data = parsed;
+        error.fromStream = true;
+        throw error;
+      }
+      if (event === 'done') return parsed;
+      if (handlers[event]) handlers[event](parsed);
+    }
+  }
+  throw new Error('Stream ended unexpectedly');
+};
+
 // AUTH API
 export const authAPI = {
   signup: (data) => api.post('/api/auth/signup', data),
@@ -164,7 +226,10 @@ export const reportAPI = {
       headers: { 'Content-Type': 'multipart/form-data' },
       timeout: 180000, // 3 minutes for uploads
     }),
-  getHistory: () => api.get('/api/report/history'),
+  // Poll a queued upload (upload with async=true returns a job_id)
+  getJob: (jobId) => api.get(`/api/report/jobs/${jobId}`),
+  // params: { limit, before } - pass next_before from the previous page
+  getHistory: (params) => api.get('/api/report/history', { params }),
   getDetails: (reportId) => api.get(`/api/report/details/${reportId}`),
   
   // Compare two reports
@@ -182,6 +247,14 @@ export const reportAPI = {
   
   // Chat with report
   chatWithReport: (reportId, data) => api.post(`/api/report/chat/${reportId}`, data),
+
+  // Streaming chat (Server-Sent Events): onToken(text) per chunk, onStart({ session_id })
+  // once the stream opens; resolves with the final { answer, timestamp, session_id } payload
+  streamChatWithReport: (reportId, data, onToken, onStart) =>
+    streamSSE(`/api/report/chat/${reportId}/stream`, data, {
+      start: (payload) => onStart && onStart(payload),
+      token: (payload) => onToken(payload.text),
+    }),
   
   // Get chat suggestions
   getChatSuggestions: (reportId) => api.get(`/api/report/chat/suggestions/${reportId}`),
@@ -190,6 +263,9 @@ export const reportAPI = {
 // JARGON API
 export const jargonAPI = {
   explain: (term) => api.post('/api/jargon/explain', { term }),
+
+  // Several terms in one request: { results: [{ query, term, definition, ... }] }
+  explainBatch: (terms) => api.post('/api/jargon/explain-batch', { terms }),
 };
 
 // Helper function to get user-friendly error message from API error